@@ -3,7 +3,28 @@
 Analyze the results from processor test
 """
 
+from array import array
+from collections import Counter
 import json
+import math
+
+READ_CHUNK_SIZE = 8 << 20  # 8 MiB blocks for JSONL reads
+SAMPLE_SIZE = 3  # Stored records printed as examples
+
+
+def iter_jsonl_lines(path, chunk_size=READ_CHUNK_SIZE):
+    """Yield raw JSONL lines (bytes) from a file read in large blocks."""
+    with open(path, 'rb') as f:
+        tail = b''
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            lines = (tail + chunk).split(b'\n')
+            tail = lines.pop()
+            yield from lines
+        if tail:
+            yield tail
 
 
 def analyze_results(filename="processor_test_results.jsonl"):
@@ -17,29 +38,36 @@ def analyze_results(filename="processor_test_results.jsonl"):
         "errors": 0
     }
     
-    stored_items = []
-    distance_stats = []
+    # Only the scalars the report needs are kept, plus a few sample records
+    qualities = []
+    stored_times = array('q')
+    samples = []
+    distance_stats = array('d')
     
     print(f"Analyzing results from: {filename}")
     print("=" * 50)
     
-    with open(filename, 'r') as f:
-        for line in f:
-            data = json.loads(line)
-            stats["total"] += 1
-            
-            result_type = data["processing_result"]
-            if result_type == "stored":
-                stats["stored"] += 1
-                stored_items.append(data)
-                if data["distance_from_last"] is not None:
-                    distance_stats.append(data["distance_from_last"])
-            elif result_type == "outlier_filtered":
-                stats["outlier_filtered"] += 1
-            elif result_type == "no_significant_movement":
-                stats["no_significant_movement"] += 1
-            elif result_type == "error":
-                stats["errors"] += 1
+    for line in iter_jsonl_lines(filename):
+        if not line:
+            continue
+        data = json.loads(line)
+        stats["total"] += 1
+        
+        result_type = data["processing_result"]
+        if result_type == "stored":
+            stats["stored"] += 1
+            qualities.append(data["input"]["quality"])
+            stored_times.append(int(data["input"]["timestamp"]))
+            if len(samples) < SAMPLE_SIZE:
+                samples.append(data)
+            if data["distance_from_last"] is not None:
+                distance_stats.append(data["distance_from_last"])
+        elif result_type == "outlier_filtered":
+            stats["outlier_filtered"] += 1
+        elif result_type == "no_significant_movement":
+            stats["no_significant_movement"] += 1
+        elif result_type == "error":
+            stats["errors"] += 1
     
     # Print basic statistics
     print(f"Processing Results:")
@@ -52,41 +80,37 @@ def analyze_results(filename="processor_test_results.jsonl"):
     # Distance analysis
     if distance_stats:
         print(f"\nDistance Analysis (meters):")
-        print(f"  Average distance between stored points: {sum(distance_stats)/len(distance_stats):.1f}m")
+        print(f"  Average distance between stored points: {math.fsum(distance_stats)/len(distance_stats):.1f}m")
         print(f"  Min distance: {min(distance_stats):.1f}m")
         print(f"  Max distance: {max(distance_stats):.1f}m")
         
         # Count distances > 1000m (potential jumps)
-        large_jumps = [d for d in distance_stats if d > 1000]
+        large_jumps = array('d', (d for d in distance_stats if d > 1000))
         print(f"  Large jumps (>1km): {len(large_jumps)}")
         if large_jumps:
-            print(f"    Average large jump: {sum(large_jumps)/len(large_jumps):.1f}m")
+            print(f"    Average large jump: {math.fsum(large_jumps)/len(large_jumps):.1f}m")
     
     # Quality analysis
-    if stored_items:
-        qualities = [item["input"]["quality"] for item in stored_items]
-        quality_counts = {}
-        for q in qualities:
-            quality_counts[q] = quality_counts.get(q, 0) + 1
+    if qualities:
+        quality_counts = Counter(qualities)
         
         print(f"\nQuality Distribution (stored items):")
         for quality, count in sorted(quality_counts.items()):
-            print(f"  Quality {quality}: {count} items ({count/len(stored_items)*100:.1f}%)")
+            print(f"  Quality {quality}: {count} items ({count/len(qualities)*100:.1f}%)")
     
     # Time range analysis
-    if stored_items:
-        times = [item["input"]["timestamp"] for item in stored_items]
-        duration_seconds = max(times) - min(times)
+    if stored_times:
+        duration_seconds = max(stored_times) - min(stored_times)
         duration_hours = duration_seconds / 3600
         
         print(f"\nTime Analysis:")
         print(f"  Time range: {duration_hours:.1f} hours")
-        print(f"  Average time between stored points: {duration_seconds/len(stored_items):.1f} seconds")
+        print(f"  Average time between stored points: {duration_seconds/len(stored_times):.1f} seconds")
         
     # Output sample of processed items
     print(f"\nSample of processed items that would be stored:")
     print("-" * 50)
-    for i, item in enumerate(stored_items[:3]):
+    for i, item in enumerate(samples):
         processed = item["processed_item"]
         print(f"Item {i+1}:")
         print(f"  Device: {processed['id']}")
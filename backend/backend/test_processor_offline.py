@@ -4,13 +4,17 @@ Offline test for processor.py logic
 Processes GPS data from JSONL file through processor logic without DynamoDB dependency
 """
 
+import argparse
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import datetime
 from decimal import Decimal
+import glob
 import json
-import math
+from math import asin, cos, pi, sin, sqrt
 import os
 import sys
-from typing import Any, Dict, List
+from typing import Any, Deque, Dict, Optional, Tuple
 
 # Add the handlers directory to the path so we can import processor functions
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src', 'handlers'))
@@ -18,54 +22,97 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'src', 'handlers'))
 # Input and output file paths
 INPUT_FILE = "/Users/ralf.sigmund/GitHub/mp_m5_fahrtenbuch/gps_logs/gps_logs/2025-04-22_locations.jsonl"
 OUTPUT_FILE = "processor_test_results.jsonl"
+READ_CHUNK_SIZE = 8 << 20  # 8 MiB blocks for JSONL reads
+WRITE_BUFFER_SIZE = 1 << 20  # 1 MiB output buffer
+
+MAX_HISTORY_SIZE = 10  # Number of locations to keep in history
+OUTLIER_WINDOW_SIZE = 3  # Recent locations averaged for outlier detection
+EARTH_DIAMETER_METERS = 2 * 6371000  # Earth radius 6371 km
+DEG_TO_RAD = pi / 180
+HALF_DEG_TO_RAD = DEG_TO_RAD * 0.5
+
+# Last stored point: degrees for reporting, radians and cos(lat) for distance maths
+LastLoc = namedtuple("LastLoc", "lat lon lat_rad lon_rad cos_lat")
 
 # Global variables (matching processor.py)
-last_valid_location = None
-location_history: List[Dict[str, Any]] = []
+last_valid_location: Optional[LastLoc] = None
+location_history: Deque[Dict[str, Any]] = deque(maxlen=MAX_HISTORY_SIZE)
+# Coordinates of the last OUTLIER_WINDOW_SIZE entries of location_history,
+# as floats, and their running sums
+recent_coords: Deque[Tuple[float, float]] = deque(maxlen=OUTLIER_WINDOW_SIZE)
+recent_lat_sum = 0.0
+recent_lon_sum = 0.0
 
 def reset_location_history():
     """Reset the location history."""
-    global location_history
-    location_history = []
+    global location_history, recent_coords, recent_lat_sum, recent_lon_sum
+    location_history = deque(maxlen=MAX_HISTORY_SIZE)
+    recent_coords = deque(maxlen=OUTLIER_WINDOW_SIZE)
+    recent_lat_sum = 0.0
+    recent_lon_sum = 0.0
+
+def add_to_location_history(location: Dict[str, Any]):
+    """
+    Add a location to the history, keeping the outlier window sums current.
+    The coordinates are converted before any state changes, so a record
+    without usable lat/lon raises and leaves the history and sums untouched.
+    """
+    global recent_lat_sum, recent_lon_sum
+
+    lat = float(location["lat"])
+    lon = float(location["lon"])
+    if len(recent_coords) == OUTLIER_WINDOW_SIZE:
+        leaving_lat, leaving_lon = recent_coords[0]
+        recent_lat_sum -= leaving_lat
+        recent_lon_sum -= leaving_lon
+    recent_lat_sum += lat
+    recent_lon_sum += lon
+
+    # deque(maxlen=...) evicts the oldest entry on append
+    recent_coords.append((lat, lon))
+    location_history.append(location)
 
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate the distance between two GPS coordinates in meters."""
-    R = 6371000  # Earth radius in meters
-
-    # Convert latitude and longitude from degrees to radians
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
-
-    # Haversine formula
-    dlon = lon2_rad - lon1_rad
-    dlat = lat2_rad - lat1_rad
+    """
+    Calculate the distance between two GPS coordinates in meters.
+    Runs several times per record, so it sticks to module-level trig names,
+    folded constants and no builtin calls.
+    """
+    sin_dlat = sin((lat2 - lat1) * HALF_DEG_TO_RAD)
+    sin_dlon = sin((lon2 - lon1) * HALF_DEG_TO_RAD)
     a = (
-        math.sin(dlat / 2) ** 2
-        + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
+        sin_dlat * sin_dlat
+        + cos(lat1 * DEG_TO_RAD) * cos(lat2 * DEG_TO_RAD) * sin_dlon * sin_dlon
     )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    distance = R * c
-
-    return distance
+    # 2*asin(sqrt(a)) == 2*atan2(sqrt(a), sqrt(1-a)); clamp guards rounding above 1
+    return EARTH_DIAMETER_METERS * asin(sqrt(a if a < 1.0 else 1.0))
+
+def make_last_location(location: Dict[str, Any]) -> LastLoc:
+    """Keep only the coordinates of a stored point, with radians precomputed."""
+    lat = location["lat"]
+    lon = location["lon"]
+    lat_rad = lat * DEG_TO_RAD
+    return LastLoc(lat, lon, lat_rad, lon * DEG_TO_RAD, cos(lat_rad))
+
+def haversine_from_cached(cached: LastLoc, lat2: float, lon2: float) -> float:
+    """Distance in meters from a point prepared by make_last_location."""
+    lat2_rad = lat2 * DEG_TO_RAD
+    sin_dlat = sin((lat2_rad - cached.lat_rad) * 0.5)
+    sin_dlon = sin((lon2 * DEG_TO_RAD - cached.lon_rad) * 0.5)
+    a = sin_dlat * sin_dlat + cached.cos_lat * cos(lat2_rad) * sin_dlon * sin_dlon
+    return EARTH_DIAMETER_METERS * asin(sqrt(a if a < 1.0 else 1.0))
 
 def is_outlier(location: Dict[str, Any], threshold_meters: float = 725) -> bool:
     """
     Determine if a location is an outlier based on distance from previous locations.
     Returns True if the location is likely an outlier.
     """
-    global location_history
-
-    if len(location_history) < 3:
+    if len(location_history) < OUTLIER_WINDOW_SIZE:
         return False
 
-    # Get previous locations
-    recent_locations = location_history[-3:]
-
-    # Calculate average position of recent locations
-    avg_lat = sum(loc["lat"] for loc in recent_locations) / len(recent_locations)
-    avg_lon = sum(loc["lon"] for loc in recent_locations) / len(recent_locations)
+    # Average position of recent locations, from the running window sums
+    avg_lat = recent_lat_sum / OUTLIER_WINDOW_SIZE
+    avg_lon = recent_lon_sum / OUTLIER_WINDOW_SIZE
 
     # Calculate distance from average to current location
     distance = haversine_distance(avg_lat, avg_lon, location["lat"], location["lon"])
@@ -74,121 +121,145 @@ def is_outlier(location: Dict[str, Any], threshold_meters: float = 725) -> bool:
     return distance > threshold_meters and location.get("quality", "") != "excellent"
 
 def is_significant_movement(
-    new_loc: Dict[str, Any], previous_loc: Dict[str, Any], min_distance: float = 10
+    new_loc: Dict[str, Any],
+    previous_loc: Optional[LastLoc],
+    min_distance: float = 10,
+    distance: Optional[float] = None,
 ) -> bool:
-    """Determine if there's significant movement (more than min_distance meters)."""
+    """
+    Determine if there's significant movement (more than min_distance meters).
+    Pass distance when it has already been computed for the same pair of points.
+    """
     if not previous_loc:
         return True
 
-    distance = haversine_distance(
-        previous_loc["lat"], previous_loc["lon"], new_loc["lat"], new_loc["lon"]
-    )
+    if distance is None:
+        distance = haversine_from_cached(previous_loc, new_loc["lat"], new_loc["lon"])
 
     return distance >= min_distance
 
 def to_decimal_safe(value):
     """Safely convert values to Decimal (for JSON serialization we'll use float)."""
+    # Numbers from the JSON decoder are the common case
+    if isinstance(value, float):
+        return value
     if value is None or value == "":
         return None
     try:
-        return float(str(value))
+        return float(value)
     except (ValueError, TypeError):
         return None
 
+def add_if_present(item: Dict[str, Any], key: str, value):
+    """Store value on item as a float, skipping missing or unparseable values."""
+    value = to_decimal_safe(value)
+    if value is not None:
+        item[key] = value
+
+def iter_jsonl_lines(path, chunk_size=READ_CHUNK_SIZE):
+    """Yield raw JSONL lines (bytes) from a file read in large blocks."""
+    with open(path, 'rb') as f:
+        tail = b''
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            lines = (tail + chunk).split(b'\n')
+            tail = lines.pop()
+            yield from lines
+        if tail:
+            yield tail
+
+def write_result(output_file, result):
+    """Append a result record to the buffered JSONL output."""
+    output_file.write(json.dumps(result))
+    output_file.write('\n')
+
 def process_single_location_offline(location_data, output_file):
     """Process a single location data point (offline version without DynamoDB)."""
-    global last_valid_location, location_history
+    global last_valid_location
 
-    try:
-        # Add to location history for filtering
-        location_history.append(location_data)
-        if len(location_history) > 10:
-            location_history.pop(0)
+    # One clock read per record, shared by every timestamp written below
+    now_iso = datetime.datetime.now().isoformat()
 
+    try:
         # Prepare the result record
         result = {
             "input": location_data,
-            "processed_at": datetime.datetime.now().isoformat(),
+            "processed_at": now_iso,
             "processing_result": None,
             "stored": False,
             "reason": None,
             "distance_from_last": None
         }
 
+        # Add to location history for filtering
+        add_to_location_history(location_data)
+
         # Calculate distance from last valid location if available
         if last_valid_location:
-            result["distance_from_last"] = haversine_distance(
-                last_valid_location["lat"], last_valid_location["lon"],
-                location_data["lat"], location_data["lon"]
+            result["distance_from_last"] = haversine_from_cached(
+                last_valid_location, location_data["lat"], location_data["lon"]
             )
 
         # Check if outlier
         if is_outlier(location_data):
             result["processing_result"] = "outlier_filtered"
             result["reason"] = "Location identified as outlier"
-            output_file.write(json.dumps(result) + '\n')
+            write_result(output_file, result)
             return result
 
         # Check if there's significant movement compared to the last stored location
-        if last_valid_location and not is_significant_movement(location_data, last_valid_location):
+        if last_valid_location and not is_significant_movement(
+            location_data, last_valid_location, distance=result["distance_from_last"]
+        ):
             result["processing_result"] = "no_significant_movement"
             result["reason"] = "Movement less than minimum threshold"
-            output_file.write(json.dumps(result) + '\n')
+            write_result(output_file, result)
             return result
 
         # This is a valid location with significant movement, prepare for "storage"
-        timestamp_iso = location_data.get("time", datetime.datetime.now().isoformat())
+        timestamp_iso = location_data.get("time", now_iso)
 
-        # Process elevation
-        elevation_in_meters = str(location_data.get("ele", 0))
-        if "M" in str(elevation_in_meters):
+        # Process elevation (string values may carry an "M" unit suffix)
+        elevation_in_meters = location_data.get("ele", 0)
+        if isinstance(elevation_in_meters, str) and "M" in elevation_in_meters:
             elevation_in_meters = elevation_in_meters.replace("M", "")
 
-        # Create the processed item (what would be stored in DynamoDB)
+        # Create the processed item (what would be stored in DynamoDB),
+        # adding optional numeric fields only when they are present
         processed_item = {
             "id": location_data.get("device_id", "unknown_device"),
             "timestamp_iso": timestamp_iso,
-            "timestamp": to_decimal_safe(location_data.get("timestamp")),
-            "lat": to_decimal_safe(location_data["lat"]),
-            "lon": to_decimal_safe(location_data["lon"]),
-            "ele": to_decimal_safe(elevation_in_meters),
-            "quality": location_data.get("quality", "unknown"),
-            "processed_at": datetime.datetime.now().isoformat(),
-            "cog": to_decimal_safe(location_data.get("cog")),
-            "sog": to_decimal_safe(location_data.get("sog")),
-            "satellites_used": to_decimal_safe(location_data.get("satellites_used"))
         }
-
-        # Remove None values from item
-        processed_item = {k: v for k, v in processed_item.items() if v is not None}
-
-        # Update the last valid location
-        last_valid_location = location_data.copy()
+        add_if_present(processed_item, "timestamp", location_data.get("timestamp"))
+        processed_item["lat"] = float(location_data["lat"])
+        processed_item["lon"] = float(location_data["lon"])
+        add_if_present(processed_item, "ele", elevation_in_meters)
+        processed_item["quality"] = location_data.get("quality", "unknown")
+        processed_item["processed_at"] = now_iso
+        for key in ("cog", "sog", "satellites_used"):
+            add_if_present(processed_item, key, location_data.get(key))
+
+        # Update the last valid location, caching its radians for the next records
+        last_valid_location = make_last_location(location_data)
 
         result["processing_result"] = "stored"
         result["stored"] = True
         result["processed_item"] = processed_item
         result["reason"] = "Valid location with significant movement"
 
-        output_file.write(json.dumps(result) + '\n')
+        write_result(output_file, result)
         return result
 
     except Exception as e:
         result["processing_result"] = "error"
         result["reason"] = f"Processing error: {str(e)}"
-        output_file.write(json.dumps(result) + '\n')
+        write_result(output_file, result)
         return result
 
-def main():
-    """Main function to process the GPS log file."""
-    print(f"Processing GPS data from: {INPUT_FILE}")
-    print(f"Output will be written to: {OUTPUT_FILE}")
-    
-    # Check if input file exists
-    if not os.path.exists(INPUT_FILE):
-        print(f"Error: Input file {INPUT_FILE} does not exist")
-        return 1
-    
+def process_file(input_path, output_path):
+    """Process one GPS log file with fresh filtering state and return its statistics."""
     # Reset processing state
     reset_location_history()
     global last_valid_location
@@ -203,47 +274,102 @@ def main():
         "errors": 0
     }
     
-    try:
-        with open(INPUT_FILE, 'r') as input_file, open(OUTPUT_FILE, 'w') as output_file:
-            print("Starting processing...")
-            
-            for line_num, line in enumerate(input_file, 1):
-                try:
-                    # Parse JSON line
-                    location_data = json.loads(line.strip())
-                    
-                    # Process the location
-                    result = process_single_location_offline(location_data, output_file)
-                    
-                    # Update statistics
-                    stats["total_processed"] += 1
-                    if result["processing_result"] == "stored":
-                        stats["stored"] += 1
-                    elif result["processing_result"] == "outlier_filtered":
-                        stats["outliers_filtered"] += 1
-                    elif result["processing_result"] == "no_significant_movement":
-                        stats["no_significant_movement"] += 1
-                    elif result["processing_result"] == "error":
-                        stats["errors"] += 1
-                    
-                    # Progress indicator
-                    if line_num % 100 == 0:
-                        print(f"Processed {line_num} lines...")
-                        
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing line {line_num}: {e}")
+    with open(output_path, 'w', buffering=WRITE_BUFFER_SIZE) as output_file:
+        for line_num, line in enumerate(iter_jsonl_lines(input_path), 1):
+            try:
+                # Parse JSON line (json.loads tolerates the trailing "\r" of CRLF files)
+                location_data = json.loads(line)
+                
+                # Process the location
+                result = process_single_location_offline(location_data, output_file)
+                
+                # Update statistics
+                stats["total_processed"] += 1
+                if result["processing_result"] == "stored":
+                    stats["stored"] += 1
+                elif result["processing_result"] == "outlier_filtered":
+                    stats["outliers_filtered"] += 1
+                elif result["processing_result"] == "no_significant_movement":
+                    stats["no_significant_movement"] += 1
+                elif result["processing_result"] == "error":
                     stats["errors"] += 1
-                    continue
+                
+                # Progress indicator
+                if line_num % 100 == 0:
+                    print(f"{os.path.basename(input_path)}: processed {line_num} lines...")
                     
-        print(f"\nProcessing complete!")
-        print(f"Results written to: {OUTPUT_FILE}")
-        print(f"\nStatistics:")
-        print(f"  Total processed: {stats['total_processed']}")
-        print(f"  Stored: {stats['stored']}")
-        print(f"  Filtered (no movement): {stats['no_significant_movement']}")
-        print(f"  Filtered (outliers): {stats['outliers_filtered']}")
-        print(f"  Errors: {stats['errors']}")
+            except json.JSONDecodeError as e:
+                print(f"Error parsing line {line_num}: {e}")
+                stats["errors"] += 1
+                continue
+    
+    return stats
+
+def print_stats(stats):
+    """Print the statistics collected for one processed file."""
+    print(f"\nStatistics:")
+    print(f"  Total processed: {stats['total_processed']}")
+    print(f"  Stored: {stats['stored']}")
+    print(f"  Filtered (no movement): {stats['no_significant_movement']}")
+    print(f"  Filtered (outliers): {stats['outliers_filtered']}")
+    print(f"  Errors: {stats['errors']}")
+    if stats['total_processed']:
         print(f"  Storage rate: {stats['stored']/stats['total_processed']*100:.1f}%")
+
+def results_path_for(input_path):
+    """Per-input results file used when several logs are processed in one run."""
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    return f"{stem}_{OUTPUT_FILE}"
+
+def main(argv=None):
+    """Main function to process one or more GPS log files."""
+    parser = argparse.ArgumentParser(
+        description="Run the processor filtering logic offline over GPS JSONL logs"
+    )
+    parser.add_argument(
+        "inputs", nargs="*",
+        help=f"Input files or glob patterns (default: {INPUT_FILE})"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(),
+        help="Worker processes when several files are given (default: CPU count)"
+    )
+    args = parser.parse_args(argv)
+    
+    patterns = args.inputs or [INPUT_FILE]
+    input_files = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+    
+    # Check if input files exist
+    if not input_files:
+        print(f"Error: No input files match {', '.join(patterns)}")
+        return 1
+    
+    try:
+        if len(input_files) == 1:
+            print(f"Processing GPS data from: {input_files[0]}")
+            print(f"Output will be written to: {OUTPUT_FILE}")
+            print("Starting processing...")
+            
+            stats = process_file(input_files[0], OUTPUT_FILE)
+            
+            print(f"\nProcessing complete!")
+            print(f"Results written to: {OUTPUT_FILE}")
+            print_stats(stats)
+            return 0
+        
+        # Each worker process has its own module state, so files run independently
+        print(f"Processing {len(input_files)} files with {args.workers} workers...")
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(process_file, path, results_path_for(path)): path
+                for path in input_files
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                stats = future.result()
+                print(f"\n{os.path.basename(path)} complete!")
+                print(f"Results written to: {results_path_for(path)}")
+                print_stats(stats)
         
         return 0
         
@@ -4,12 +4,19 @@ Script to fix existing driver logs by adding missing vehicleId field.
 """
 
 import boto3
+from boto3.dynamodb.conditions import Attr
 import json
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from botocore.exceptions import ClientError
+import threading
 
 # Table names
 LOGS_TABLE = "gps-tracking-service-prod-locations-logs-v2"
+SCAN_SEGMENTS = 8  # Parallel scan segments (one worker thread each)
+UPDATE_WORKERS = 8  # Concurrent update_item calls
+
+_thread_local = threading.local()
 
 def decimal_default(obj):
     """JSON serializer for objects not serializable by default json code"""
@@ -17,71 +24,104 @@ def decimal_default(obj):
         return float(obj)
     raise TypeError
 
+def get_logs_table():
+    """Return a logs table resource owned by the calling thread"""
+    # Resources are not thread-safe, so each worker builds its own
+    if not hasattr(_thread_local, 'logs_table'):
+        session = boto3.session.Session()
+        _thread_local.logs_table = session.resource(
+            'dynamodb', region_name='eu-central-1'
+        ).Table(LOGS_TABLE)
+    return _thread_local.logs_table
+
+def scan_segment(segment, total_segments, **scan_kwargs):
+    """Scan one segment of the logs table, following pagination"""
+    logs_table = get_logs_table()
+    
+    scan_kwargs.update(Segment=segment, TotalSegments=total_segments)
+    response = logs_table.scan(**scan_kwargs)
+    items = response['Items']
+    
+    while 'LastEvaluatedKey' in response:
+        response = logs_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'], **scan_kwargs)
+        items.extend(response['Items'])
+    
+    print(f"Segment {segment + 1}/{total_segments}: found {len(items)} items")
+    return items
+
+def parallel_scan(total_segments=SCAN_SEGMENTS, **scan_kwargs):
+    """Scan the logs table with one thread per segment and merge the results"""
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        futures = [
+            executor.submit(scan_segment, segment, total_segments, **scan_kwargs)
+            for segment in range(total_segments)
+        ]
+        items = []
+        for future in futures:
+            items.extend(future.result())
+    return items
+
+def vehicle_id_from_session(session_id):
+    """Derive the vehicleId for a log from its session ID"""
+    vehicle_id = 'vehicle_01'  # default
+    
+    if session_id:
+        # Session IDs often have format like "session_timestamp_vehicleId"
+        parts = session_id.split('_')
+        if len(parts) >= 3:
+            # Last part might be the vehicle ID
+            potential_vehicle_id = parts[-1]
+            if potential_vehicle_id in ['BlogClient', 'vehicle_01']:
+                vehicle_id = potential_vehicle_id
+                print(f"  Extracted vehicleId '{vehicle_id}' from session ID")
+    
+    return vehicle_id
+
+def fix_item(item):
+    """Set vehicleId on a single log item unless another writer already did"""
+    print(f"Item {item.get('id', 'unknown')} is missing vehicleId")
+    vehicle_id = vehicle_id_from_session(item.get('id', ''))
+    
+    try:
+        # if_not_exists keeps the update idempotent under concurrent writers
+        get_logs_table().update_item(
+            Key={
+                'id': item['id'],
+                'timestamp': item['timestamp']
+            },
+            UpdateExpression='SET vehicleId = if_not_exists(vehicleId, :vehicle_id)',
+            ExpressionAttributeValues={
+                ':vehicle_id': vehicle_id
+            }
+        )
+        print(f"  ✅ Updated {item['id']} with vehicleId: {vehicle_id}")
+        return True
+    except Exception as e:
+        print(f"  ❌ Error updating {item['id']}: {e}")
+        return False
+
 def fix_logs_vehicleId():
     """Add vehicleId field to logs that are missing it"""
-    dynamodb = boto3.resource('dynamodb', region_name='eu-central-1')
-    logs_table = dynamodb.Table(LOGS_TABLE)
-    
     print(f"Fixing missing vehicleId fields in {LOGS_TABLE}")
     
     try:
-        # Scan the logs table
-        print("Scanning logs table...")
-        response = logs_table.scan()
-        items = response['Items']
-        
-        # Handle pagination if there are more items
-        while 'LastEvaluatedKey' in response:
-            print(f"Found {len(items)} items so far, continuing scan...")
-            response = logs_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-            items.extend(response['Items'])
+        # Let DynamoDB skip logs that already have a vehicleId and return only keys
+        print(f"Scanning logs table in {SCAN_SEGMENTS} segments...")
+        items = parallel_scan(
+            FilterExpression=Attr('vehicleId').not_exists(),
+            ProjectionExpression='id, #t',
+            ExpressionAttributeNames={'#t': 'timestamp'}
+        )
         
         total_items = len(items)
-        print(f"Found {total_items} log items to process")
+        print(f"Found {total_items} log items missing vehicleId")
         
         if total_items == 0:
-            print("No items found in logs table")
-            return
-        
-        fixed_count = 0
+            print("No log items need fixing")
+            return True
         
-        for item in items:
-            # Check if vehicleId is missing
-            if 'vehicleId' not in item:
-                print(f"Item {item.get('id', 'unknown')} is missing vehicleId")
-                
-                # Try to extract vehicleId from the session ID
-                session_id = item.get('id', '')
-                vehicle_id = 'vehicle_01'  # default
-                
-                if session_id:
-                    # Session IDs often have format like "session_timestamp_vehicleId"
-                    parts = session_id.split('_')
-                    if len(parts) >= 3:
-                        # Last part might be the vehicle ID
-                        potential_vehicle_id = parts[-1]
-                        if potential_vehicle_id in ['BlogClient', 'vehicle_01']:
-                            vehicle_id = potential_vehicle_id
-                            print(f"  Extracted vehicleId '{vehicle_id}' from session ID")
-                
-                # Update the item
-                try:
-                    logs_table.update_item(
-                        Key={
-                            'id': item['id'],
-                            'timestamp': item['timestamp']
-                        },
-                        UpdateExpression='SET vehicleId = :vehicle_id',
-                        ExpressionAttributeValues={
-                            ':vehicle_id': vehicle_id
-                        }
-                    )
-                    print(f"  ✅ Updated {item['id']} with vehicleId: {vehicle_id}")
-                    fixed_count += 1
-                except Exception as e:
-                    print(f"  ❌ Error updating {item['id']}: {e}")
-            else:
-                print(f"Item {item.get('id', 'unknown')} already has vehicleId: {item['vehicleId']}")
+        with ThreadPoolExecutor(max_workers=UPDATE_WORKERS) as executor:
+            fixed_count = sum(executor.map(fix_item, items))
         
         print(f"✅ Fixed {fixed_count}/{total_items} log entries")
         
@@ -6,13 +6,19 @@ Copies data from gps-tracking-service-dev-locations-v2 to gps-tracking-service-p
 
 import boto3
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from decimal import Decimal
+from botocore.config import Config
 from botocore.exceptions import ClientError
-import time
 
 # Table names
 SOURCE_TABLE = "gps-tracking-service-dev-locations-v2"
 TARGET_TABLE = "gps-tracking-service-prod-locations-v2"
+SCAN_SEGMENTS = 8  # Parallel scan segments (one worker thread each)
+WRITE_WORKERS = 16  # Concurrent batch writers for the target table
+
+# Let botocore back off on throttling instead of sleeping between batches
+RETRY_CONFIG = Config(retries={'max_attempts': 10, 'mode': 'adaptive'})
 
 def decimal_default(obj):
     """JSON serializer for objects not serializable by default json code"""
@@ -20,26 +26,71 @@ def decimal_default(obj):
         return float(obj)
     raise TypeError
 
+def scan_segment(segment, total_segments):
+    """Scan one segment of the source table, following pagination"""
+    # Resources are not thread-safe, so each worker builds its own
+    session = boto3.session.Session()
+    source_table = session.resource('dynamodb', region_name='eu-central-1').Table(SOURCE_TABLE)
+    
+    response = source_table.scan(Segment=segment, TotalSegments=total_segments)
+    items = response['Items']
+    
+    while 'LastEvaluatedKey' in response:
+        response = source_table.scan(
+            Segment=segment,
+            TotalSegments=total_segments,
+            ExclusiveStartKey=response['LastEvaluatedKey']
+        )
+        items.extend(response['Items'])
+    
+    print(f"Segment {segment + 1}/{total_segments}: found {len(items)} items")
+    return items
+
+def parallel_scan(total_segments=SCAN_SEGMENTS):
+    """Scan the source table with one thread per segment and merge the results"""
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        futures = [
+            executor.submit(scan_segment, segment, total_segments)
+            for segment in range(total_segments)
+        ]
+        items = []
+        for future in futures:
+            items.extend(future.result())
+    return items
+
+def write_chunk(items):
+    """Write a chunk of items to the target table with a dedicated batch writer"""
+    session = boto3.session.Session()
+    target_table = session.resource(
+        'dynamodb', region_name='eu-central-1', config=RETRY_CONFIG
+    ).Table(TARGET_TABLE)
+    
+    written = 0
+    with target_table.batch_writer() as batch:
+        for item in items:
+            try:
+                # Put item to target table
+                batch.put_item(Item=item)
+                written += 1
+            except Exception as e:
+                print(f"Error writing item: {e}")
+                print(f"Item: {json.dumps(item, default=decimal_default)}")
+                continue
+    
+    return written
+
 def copy_table_data():
     """Copy all data from source table to target table"""
-    dynamodb = boto3.resource('dynamodb', region_name='eu-central-1')
+    dynamodb = boto3.resource('dynamodb', region_name='eu-central-1', config=RETRY_CONFIG)
     
-    source_table = dynamodb.Table(SOURCE_TABLE)
     target_table = dynamodb.Table(TARGET_TABLE)
     
     print(f"Starting migration from {SOURCE_TABLE} to {TARGET_TABLE}")
     
     try:
-        # Scan the source table
-        print("Scanning source table...")
-        response = source_table.scan()
-        items = response['Items']
-        
-        # Handle pagination if there are more items
-        while 'LastEvaluatedKey' in response:
-            print(f"Found {len(items)} items so far, continuing scan...")
-            response = source_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-            items.extend(response['Items'])
+        # Scan the source table in parallel segments
+        print(f"Scanning source table in {SCAN_SEGMENTS} segments...")
+        items = parallel_scan()
         
         total_items = len(items)
         print(f"Found {total_items} items to migrate")
@@ -48,24 +99,17 @@ def copy_table_data():
             print("No items found in source table")
             return
         
-        # Batch write to target table
-        print("Starting batch write to target table...")
-        batch_size = 25  # DynamoDB batch write limit
+        # Batch write to target table, one batch writer per worker
+        print(f"Starting batch write to target table with {WRITE_WORKERS} workers...")
+        chunk_size = -(-total_items // WRITE_WORKERS)  # ceil division
+        chunks = [items[i:i + chunk_size] for i in range(0, total_items, chunk_size)]
         
-        with target_table.batch_writer() as batch:
-            for i, item in enumerate(items):
-                try:
-                    # Put item to target table
-                    batch.put_item(Item=item)
-                    
-                    if (i + 1) % batch_size == 0:
-                        print(f"Processed {i + 1}/{total_items} items")
-                        time.sleep(0.1)  # Small delay to avoid throttling
-                        
-                except Exception as e:
-                    print(f"Error writing item {i}: {e}")
-                    print(f"Item: {json.dumps(item, default=decimal_default)}")
-                    continue
+        processed = 0
+        with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as executor:
+            futures = [executor.submit(write_chunk, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                processed += future.result()
+                print(f"Processed {processed}/{total_items} items")
         
         print(f"Migration completed! Copied {total_items} items")
         
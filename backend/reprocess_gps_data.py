@@ -6,106 +6,270 @@ Reprocess GPS data with enhanced temporal-aware outlier detection
 3. Send all raw data in chronological order as a batch to the lambda function
 """
 
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
+from functools import partial
+from itertools import islice
 import json
+from operator import gt, itemgetter
 import os
+import queue
+import re
 import sys
+import threading
 import time
-from typing import Any, Dict, List
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import boto3
 from boto3.dynamodb.conditions import Attr, Key
+from botocore.config import Config
 
 # Configuration
 GPS_LOGS_DIR = "/Users/ralf.sigmund/GitHub/mp_m5_fahrtenbuch/gps_logs/gps_logs"
 LAMBDA_FUNCTION_NAME = "location-backend-dev-processLocationData"
 DYNAMODB_TABLE = "gps-tracking-service-dev-locations-v2"
 DEVICE_ID = "vehicle_01"
+READ_CHUNK_SIZE = 8 << 20  # block size for newline counting
+TAIL_CHUNK_SIZE = 4096  # block size for the backwards scan to the last line
+DELETE_BATCH_SIZE = 25  # BatchExecuteStatement request limit
+DELETE_ATTEMPTS = 5  # Tries per statement when a delete is throttled
+DELETE_STATEMENT = f'DELETE FROM "{DYNAMODB_TABLE}" WHERE "id" = ? AND "timestamp" = ?'
+RETRYABLE_STATEMENT_ERRORS = {
+    'ProvisionedThroughputExceeded', 'ThrottlingError', 'RequestLimitExceeded', 'InternalServerError'
+}
+# Timezone suffixes understood by parse_timestamp: "Z", "+hh:mm"/"-hhmm"
+# offsets and the named zones some loggers write (MESZ is the German
+# abbreviation for CEST; MES and MEST also occur)
+TZ_SUFFIX_PATTERN = re.compile(r'\s?(?:Z|[+-]\d{2}:?\d{2}|MES[TZ]?|CES?T|CET)$')
+PARSE_FALLBACK_TIME = datetime(1970, 1, 1)  # returned when a 'time' cannot be parsed
+ANALYZE_CACHE_SUFFIX = '.meta.json'  # sidecar file holding a cached analysis
+MAX_PAYLOAD_BYTES = int(5.5 * 1024 * 1024)  # 6MB synchronous invoke limit, with some buffer
+PAYLOAD_QUEUE_SIZE = 4  # payloads packed ahead of the lambda invocation in flight
+DELETE_WORKERS = 16  # Concurrent delete batches; the delete phase is latency-bound
+
+# Shared by every AWS client: throttled calls back off individually instead of
+# stalling the whole run, and pooled keep-alive connections are reused across
+# calls and files instead of reconnecting
+CLIENT_CONFIG = Config(
+    retries={'max_attempts': 10, 'mode': 'adaptive'},
+    max_pool_connections=DELETE_WORKERS,
+    tcp_keepalive=True,
+)
 
 # Initialize AWS clients
-dynamodb = boto3.resource('dynamodb', region_name='eu-central-1')
+dynamodb = boto3.resource('dynamodb', region_name='eu-central-1', config=CLIENT_CONFIG)
 table = dynamodb.Table(DYNAMODB_TABLE)
-lambda_client = boto3.client('lambda', region_name='eu-central-1')
+lambda_client = boto3.client('lambda', region_name='eu-central-1', config=CLIENT_CONFIG)
+# Low-level client for PartiQL deletes; unlike resources it is thread-safe
+dynamodb_client = boto3.client('dynamodb', region_name='eu-central-1', config=CLIENT_CONFIG)
+
+# Compact separators shrink lambda payloads; one shared encoder avoids
+# json.dumps building a new encoder for every record
+PAYLOAD_ENCODER = json.JSONEncoder(separators=(',', ':'))
 
 def parse_timestamp(time_str: str) -> datetime:
     """Parse ISO timestamp to datetime object with robust error handling."""
     try:
-        # Handle different timezone formats
-        if '+' in time_str:
-            time_part, tz_part = time_str.rsplit('+', 1)
-            time_str = time_part  # Ignore timezone for simplicity
-        elif time_str.endswith('Z'):
-            time_str = time_str[:-1]
-        elif ' MES' in time_str:
-            # Handle "MES" timezone (Central European Summer Time)
-            time_str = time_str.replace(' MES', '')
-        elif ' CET' in time_str:
-            # Handle "CET" timezone (Central European Time)
-            time_str = time_str.replace(' CET', '')
-        elif ' CEST' in time_str:
-            # Handle "CEST" timezone (Central European Summer Time)
-            time_str = time_str.replace(' CEST', '')
-        
-        # Try to parse the timestamp
-        return datetime.fromisoformat(time_str)
+        # Strip the timezone suffix (offset, Z, MES/CET/CEST) in one regex pass;
+        # the timezone is ignored for simplicity
+        return datetime.fromisoformat(TZ_SUFFIX_PATTERN.sub('', time_str, count=1))
     except ValueError as e:
         # If parsing fails, try to extract timestamp from epoch field if available
         print(f"   ⚠️  Warning: Could not parse timestamp '{time_str}': {e}")
         # Return a fallback datetime (we'll use epoch timestamp instead)
-        return datetime(1970, 1, 1)
+        return PARSE_FALLBACK_TIME
 
-def analyze_jsonl_file(file_path: str) -> Dict[str, Any]:
-    """Analyze a JSONL file to extract time range and device info."""
-    print(f"\n📂 Analyzing: {os.path.basename(file_path)}")
-    
-    first_line = None
-    last_line = None
+def record_time(record: Dict[str, Any]) -> Tuple[datetime, int]:
+    """Return a record's datetime and epoch timestamp, parsing 'time' only when 'timestamp' is missing."""
+    timestamp = record.get('timestamp')
+    if timestamp:
+        return datetime.fromtimestamp(timestamp), timestamp
+    time_value = parse_timestamp(record['time'])
+    return time_value, int(time_value.timestamp())
+
+def record_epoch(record: Dict[str, Any]) -> int:
+    """
+    Return a record's epoch timestamp like record_time, without building a
+    datetime when 'timestamp' is set. Records with neither field, or with a
+    'time' that cannot be parsed, return 0.
+    """
+    timestamp = record.get('timestamp')
+    if timestamp:
+        return timestamp
+    time_value = record.get('time')
+    if not time_value:
+        return 0
+    parsed = parse_timestamp(time_value)
+    if parsed == PARSE_FALLBACK_TIME:
+        # The fallback is a naive local time, so its epoch depends on the
+        # machine's timezone and cannot be told apart by sign
+        return 0
+    return int(parsed.timestamp())
+
+def count_lines(f: BinaryIO) -> int:
+    """Count lines by scanning for newlines block by block, without parsing."""
+    f.seek(0)
     line_count = 0
-    device_ids = set()
-    parse_errors = 0
-    
-    with open(file_path, 'r') as f:
-        for line_num, line in enumerate(f, 1):
+    block = b'\n'
+    for block in iter(partial(f.read, READ_CHUNK_SIZE), b''):
+        line_count += block.count(b'\n')
+    if not block.endswith(b'\n'):
+        line_count += 1  # last line has no trailing newline
+    return line_count
+
+def iter_lines_reversed(f: BinaryIO) -> Iterator[bytes]:
+    """Yield the non-empty lines of a file from last to first, reading from EOF backwards."""
+    f.seek(0, os.SEEK_END)
+    pos = f.tell()
+    remainder = b''
+    while pos > 0:
+        step = min(TAIL_CHUNK_SIZE, pos)
+        pos -= step
+        f.seek(pos)
+        lines = (f.read(step) + remainder).split(b'\n')
+        remainder = lines.pop(0)
+        for line in reversed(lines):
             if line.strip():
+                yield line
+    if remainder.strip():
+        yield remainder
+
+def first_valid_record(lines: Iterable[bytes]) -> Tuple[Optional[Dict[str, Any]], int]:
+    """Parse lines until one is valid JSON; return it with the number of lines skipped."""
+    parse_errors = 0
+    for line in lines:
+        try:
+            return json.loads(line), parse_errors
+        except json.JSONDecodeError as e:
+            print(f"⚠️  Skipping unparsable line: {e}")
+            parse_errors += 1
+    return None, parse_errors
+
+def iter_lines(f: BinaryIO) -> Iterator[bytes]:
+    """Yield the lines of a binary file, reading it in large blocks."""
+    remainder = b''
+    for block in iter(partial(f.read, READ_CHUNK_SIZE), b''):
+        lines = (remainder + block).split(b'\n')
+        remainder = lines.pop()
+        yield from lines
+    if remainder:
+        yield remainder
+
+def iter_records(
+    file_path: str, stats: Dict[str, int]
+) -> Iterator[Tuple[bytes, Dict[str, Any]]]:
+    """
+    Yield (line, record) pairs for the valid lines of a JSONL file, counting
+    bad lines in stats['parse_errors']. The stripped line is itself valid JSON
+    for the record, so callers can forward it without re-encoding.
+    """
+    with open(file_path, 'rb') as f:
+        for line_num, line in enumerate(iter_lines(f), 1):
+            line = line.strip()
+            if line:
                 try:
-                    data = json.loads(line.strip())
-                    device_ids.add(data.get('device_id', 'unknown'))
-                    
-                    if first_line is None:
-                        first_line = data
-                    last_line = data
-                    line_count += 1
-                    
+                    yield line, json.loads(line)
                 except json.JSONDecodeError as e:
-                    print(f"⚠️  Error parsing line {line_num}: {e}")
-                    parse_errors += 1
-                    continue
+                    print(f"   ⚠️  Error parsing line {line_num}: {e}")
+                    stats['parse_errors'] += 1
+
+def analyze_jsonl_file(file_path: str, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Analyze a JSONL file to extract time range and device info for a dry run.
+    Only the first and last valid records are parsed; the logs are append-only,
+    so they bound the time range. The device IDs come from those two records
+    and the line count is of raw lines, so real runs use analyze_and_load
+    instead. Results are cached in a sidecar file and reused while the file's
+    size and mtime are unchanged.
+    """
+    print(f"\n📂 Analyzing: {os.path.basename(file_path)}")
+    
+    if use_cache:
+        info = load_cached_info(file_path)
+        if info:
+            print("   💾 Using cached analysis")
+            print_file_info(info)
+            return info
+    
+    with open(file_path, 'rb') as f:
+        first_line, head_errors = first_valid_record(line for line in f if line.strip())
+        last_line, tail_errors = first_valid_record(iter_lines_reversed(f))
+        line_count = count_lines(f)
     
     if not first_line or not last_line:
         print(f"❌ No valid data found in {file_path}")
         return None
     
-    # Use epoch timestamps directly if available, fallback to parsing time field
-    start_timestamp = first_line.get('timestamp')
-    end_timestamp = last_line.get('timestamp')
+    device_ids = {
+        first_line.get('device_id', 'unknown'),
+        last_line.get('device_id', 'unknown'),
+    }
+    info = describe_file(
+        file_path, first_line, last_line, line_count, device_ids, head_errors + tail_errors,
+        boundary_only=True
+    )
+    if info and use_cache:
+        store_cached_info(file_path, info)
+    return info
+
+def analyze_and_load(file_path: str) -> Tuple[Optional[Dict[str, Any]], List[Tuple[int, bytes]]]:
+    """
+    Analyze a JSONL file and load its GPS points in the same pass.
+    Points are kept as (record_epoch, JSON line) pairs, ready for resubmit_jsonl_file.
+    """
+    print(f"\n📂 Analyzing: {os.path.basename(file_path)}")
     
-    if start_timestamp and end_timestamp:
-        # Use epoch timestamps
-        start_time = datetime.fromtimestamp(start_timestamp)
-        end_time = datetime.fromtimestamp(end_timestamp)
-    else:
-        # Fallback to parsing time field
-        try:
-            start_time = parse_timestamp(first_line['time'])
-            end_time = parse_timestamp(last_line['time'])
-            # Convert to epoch if we don't have timestamp field
-            if not start_timestamp:
-                start_timestamp = int(start_time.timestamp())
-            if not end_timestamp:
-                end_timestamp = int(end_time.timestamp())
-        except Exception as e:
-            print(f"❌ Could not determine time range: {e}")
-            return None
+    read_stats = {'parse_errors': 0}
+    device_ids = set()
+    points = []
+    for line, data in iter_records(file_path, read_stats):
+        device_ids.add(data.get('device_id', 'unknown'))
+        # Keep the source line, not the dict: it is a fraction of the size
+        # and goes into the lambda payload as-is
+        points.append((record_epoch(data), line))
+    
+    if not points:
+        print(f"❌ No valid data found in {file_path}")
+        return None, points
+    
+    # Earliest and latest points by time, found with C-level min/max
+    # reductions; unlike file position, this also bounds out-of-order files.
+    # Keyed on the time alone so equal times never fall back to the line
+    # bytes, and points without a usable time (record_epoch 0) do not
+    # stretch the range
+    timed_points = [point for point in points if point[0] > 0]
+    if not timed_points:
+        print(f"❌ Could not determine time range: no timestamps in {file_path}")
+        return None, points
+    first_line = json.loads(min(timed_points, key=itemgetter(0))[1])
+    last_line = json.loads(max(timed_points, key=itemgetter(0))[1])
+    info = describe_file(
+        file_path, first_line, last_line, len(points), device_ids, read_stats['parse_errors']
+    )
+    return info, points
+
+def describe_file(
+    file_path: str,
+    first_line: Dict[str, Any],
+    last_line: Dict[str, Any],
+    line_count: int,
+    device_ids: Set[str],
+    parse_errors: int,
+    boundary_only: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """
+    Build and print the summary of a JSONL file from its first and last records.
+    boundary_only marks a summary whose line count and device IDs were not
+    taken from a full pass over the file.
+    """
+    # Use epoch timestamps directly if available, fallback to parsing time field
+    try:
+        start_time, start_timestamp = record_time(first_line)
+        end_time, end_timestamp = record_time(last_line)
+    except Exception as e:
+        print(f"❌ Could not determine time range: {e}")
+        return None
     
     info = {
         'file_path': file_path,
@@ -117,19 +281,116 @@ def analyze_jsonl_file(file_path: str) -> Dict[str, Any]:
         'start_timestamp': start_timestamp,
         'end_timestamp': end_timestamp,
         'duration_hours': (end_time - start_time).total_seconds() / 3600,
-        'parse_errors': parse_errors
+        'parse_errors': parse_errors,
+        'boundary_only': boundary_only
     }
     
-    print(f"   📊 Lines: {line_count}")
-    if parse_errors > 0:
-        print(f"   ⚠️  Parse errors: {parse_errors}")
-    print(f"   🔧 Device IDs: {', '.join(device_ids)}")
-    print(f"   ⏰ Time range: {start_time} to {end_time}")
+    print_file_info(info)
+    return info
+
+def print_file_info(info: Dict[str, Any]):
+    """Print the summary built by describe_file."""
+    # Dry-run summaries count blank and unparsable lines too, and only check
+    # the first and last records for device IDs
+    if info.get('boundary_only'):
+        lines_label, devices_label = "Raw lines", "Device IDs (first/last record)"
+    else:
+        lines_label, devices_label = "Lines", "Device IDs"
+    print(f"   📊 {lines_label}: {info['line_count']}")
+    if info['parse_errors'] > 0:
+        print(f"   ⚠️  Parse errors: {info['parse_errors']}")
+    print(f"   🔧 {devices_label}: {', '.join(info['device_ids'])}")
+    print(f"   ⏰ Time range: {info['start_time']} to {info['end_time']}")
     print(f"   ⌛ Duration: {info['duration_hours']:.1f} hours")
-    print(f"   📅 Timestamps: {start_timestamp} to {end_timestamp}")
-    
+    print(f"   📅 Timestamps: {info['start_timestamp']} to {info['end_timestamp']}")
+
+def load_cached_info(file_path: str) -> Optional[Dict[str, Any]]:
+    """Return the cached summary of a file if its size and mtime are unchanged."""
+    stat = os.stat(file_path)
+    try:
+        with open(file_path + ANALYZE_CACHE_SUFFIX, 'rb') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get('mtime_ns') != stat.st_mtime_ns or cached.get('size') != stat.st_size:
+        return None
+    info = cached['info']
+    info.setdefault('boundary_only', True)  # only dry-run analyses are cached
+    info['start_time'] = datetime.fromisoformat(info['start_time'])
+    info['end_time'] = datetime.fromisoformat(info['end_time'])
     return info
 
+def store_cached_info(file_path: str, info: Dict[str, Any]):
+    """Save a file summary next to the file, keyed by its size and mtime."""
+    stat = os.stat(file_path)
+    cached = {
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'info': dict(
+            info,
+            start_time=info['start_time'].isoformat(),
+            end_time=info['end_time'].isoformat()
+        )
+    }
+    try:
+        with open(file_path + ANALYZE_CACHE_SUFFIX, 'w') as f:
+            json.dump(cached, f)
+    except OSError as e:
+        print(f"   ⚠️  Could not write analysis cache: {e}")
+
+def query_record_keys(table, device_id: str, start_ts: int, end_ts: int) -> List[Dict[str, Any]]:
+    """Fetch the primary keys of all table records in a time range, following every result page."""
+    query_kwargs = {
+        'KeyConditionExpression': 'id = :device_id AND #ts BETWEEN :start_ts AND :end_ts',
+        'ProjectionExpression': 'id, #ts',
+        'ExpressionAttributeNames': {'#ts': 'timestamp'},
+        'ExpressionAttributeValues': {
+            ':device_id': device_id,
+            ':start_ts': start_ts,
+            ':end_ts': end_ts
+        }
+    }
+    response = table.query(**query_kwargs)
+    items = response.get('Items', [])
+    while 'LastEvaluatedKey' in response:
+        response = table.query(ExclusiveStartKey=response['LastEvaluatedKey'], **query_kwargs)
+        items.extend(response.get('Items', []))
+    return items
+
+def delete_key_chunk(keys: List[Dict[str, Any]]) -> int:
+    """
+    Delete up to 25 keys with one PartiQL BatchExecuteStatement request.
+    Statements that fail on throttling are resent with exponential backoff.
+    Returns the number of keys deleted.
+    """
+    statements = [
+        {
+            'Statement': DELETE_STATEMENT,
+            'Parameters': [{'S': key['id']}, {'N': str(key['timestamp'])}]
+        }
+        for key in keys
+    ]
+    deleted = 0
+    for attempt in range(DELETE_ATTEMPTS):
+        if attempt:
+            time.sleep(0.1 * 2 ** attempt)
+        responses = dynamodb_client.batch_execute_statement(Statements=statements)['Responses']
+        retry = []
+        for statement, response in zip(statements, responses):
+            error = response.get('Error')
+            if not error:
+                deleted += 1
+            elif error.get('Code') in RETRYABLE_STATEMENT_ERRORS:
+                retry.append(statement)
+            else:
+                print(f"   ⚠️  Error deleting item {statement['Parameters'][1]['N']}: {error.get('Message')}")
+        if not retry:
+            break
+        statements = retry
+    else:
+        print(f"   ⚠️  Gave up on {len(statements)} throttled deletes")
+    return deleted
+
 def delete_dynamodb_data(device_id: str, start_timestamp: int, end_timestamp: int) -> int:
     """Delete data from DynamoDB for the given device and timestamp range."""
     print(f"\n🗑️  Deleting DynamoDB data for {device_id} from {start_timestamp} to {end_timestamp}")
@@ -137,36 +398,20 @@ def delete_dynamodb_data(device_id: str, start_timestamp: int, end_timestamp: in
     deleted_count = 0
     
     try:
-        # Query items in the timestamp range
-        response = table.query(
-            KeyConditionExpression='id = :device_id AND #ts BETWEEN :start_ts AND :end_ts',
-            ExpressionAttributeNames={'#ts': 'timestamp'},
-            ExpressionAttributeValues={
-                ':device_id': device_id,
-                ':start_ts': start_timestamp,
-                ':end_ts': end_timestamp
-            }
-        )
-        
-        items = response.get('Items', [])
+        # Query the keys of all items in the timestamp range
+        items = query_record_keys(table, device_id, start_timestamp, end_timestamp)
         print(f"   📋 Found {len(items)} items to delete")
         
-        # Delete items in batches
-        for item in items:
-            try:
-                table.delete_item(
-                    Key={
-                        'id': item['id'],
-                        'timestamp': item['timestamp']
-                    }
-                )
-                deleted_count += 1
-                
-                if deleted_count % 10 == 0:
+        # Delete in 25-key batches, several requests in flight at once
+        chunks = [items[i:i + DELETE_BATCH_SIZE] for i in range(0, len(items), DELETE_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as executor:
+            futures = [executor.submit(delete_key_chunk, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                try:
+                    deleted_count += future.result()
                     print(f"   🗑️  Deleted {deleted_count}/{len(items)} items...")
-                    
-            except Exception as e:
-                print(f"   ⚠️  Error deleting item {item.get('timestamp')}: {e}")
+                except Exception as e:
+                    print(f"   ⚠️  Error deleting batch: {e}")
         
         print(f"   ✅ Deleted {deleted_count} items from DynamoDB")
         
@@ -175,37 +420,73 @@ def delete_dynamodb_data(device_id: str, start_timestamp: int, end_timestamp: in
     
     return deleted_count
 
-def submit_gps_batch(gps_data_list: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Submit a batch of GPS data to the lambda function for processing."""
+def pack_payloads(encoded_points: Iterable[bytes]) -> Iterator[Tuple[bytes, int]]:
+    """
+    Pack JSON-encoded GPS points greedily into list payloads no larger than
+    MAX_PAYLOAD_BYTES, preserving their order. Yields (payload, point_count)
+    pairs as soon as each payload is full.
+    """
+    encoded = []
+    size = 2  # enclosing brackets
+    for data in encoded_points:
+        if encoded and size + len(data) + 1 > MAX_PAYLOAD_BYTES:
+            yield b'[' + b','.join(encoded) + b']', len(encoded)
+            encoded = []
+            size = 2
+        encoded.append(data)
+        size += len(data) + 1  # separator
+    if encoded:
+        yield b'[' + b','.join(encoded) + b']', len(encoded)
+
+def build_payloads(gps_data_list: List[Dict[str, Any]]) -> List[Tuple[bytes, int]]:
+    """Serialize GPS points into JSON list payloads no larger than MAX_PAYLOAD_BYTES."""
+    # Common case: the whole batch fits, so encode the list in one call
+    payload = PAYLOAD_ENCODER.encode(gps_data_list).encode('utf-8')
+    if len(payload) <= MAX_PAYLOAD_BYTES:
+        return [(payload, len(gps_data_list))]
+    
+    return list(pack_payloads(
+        PAYLOAD_ENCODER.encode(record).encode('utf-8') for record in gps_data_list
+    ))
+
+def invoke_gps_payload(payload: bytes, point_count: int) -> Dict[str, Any]:
+    """Invoke the lambda function with one serialized batch of GPS points."""
     try:
-        print(f"📤 Submitting batch of {len(gps_data_list)} GPS points to lambda...")
-        
-        # Prepare payload - lambda expects a list for batch processing
-        payload = json.dumps(gps_data_list)
-        
-        # Check payload size (6MB limit for synchronous invocation)
-        payload_size_mb = len(payload.encode('utf-8')) / (1024 * 1024)
-        print(f"   📦 Payload size: {payload_size_mb:.2f} MB")
-        
-        if payload_size_mb > 5.5:  # Leave some buffer
-            raise ValueError(f"Payload too large: {payload_size_mb:.2f} MB (max ~5.5 MB)")
+        payload_size_mb = len(payload) / (1024 * 1024)
+        print(f"   📦 Payload size: {payload_size_mb:.2f} MB ({point_count} points)")
         
         # Invoke lambda function directly
         response = lambda_client.invoke(
             FunctionName=LAMBDA_FUNCTION_NAME,
             InvocationType='RequestResponse',  # Synchronous invocation
-            Payload=payload.encode('utf-8')
+            Payload=payload
         )
         
         # Parse response
-        response_payload = json.loads(response['Payload'].read().decode('utf-8'))
+        response_payload = json.loads(response['Payload'].read())
         
         print(f"   ✅ Lambda response status: {response_payload.get('statusCode', 'unknown')}")
         
         if response_payload.get('statusCode') == 200:
-            body = json.loads(response_payload.get('body', '{}'))
+            body = response_payload.get('body', '{}')
+            if isinstance(body, (str, bytes)):
+                body = json.loads(body)
             print(f"   📊 Result: {body.get('status', 'unknown')}")
             
+            # Prefer the batch summary counts; older deployments only return
+            # the per-point details, which have to be counted here
+            if 'successful' in body:
+                success_count = body['successful']
+                total_count = body.get('total', point_count)
+                print(f"   📈 Processed: {success_count}/{total_count} successfully")
+                
+                return {
+                    'success': True,
+                    'total': total_count,
+                    'successful': success_count,
+                    'failed': total_count - success_count
+                }
+            
             # Extract success/failure details if available
             details = body.get('details', [])
             if details:
@@ -224,8 +505,8 @@ def submit_gps_batch(gps_data_list: List[Dict[str, Any]]) -> Dict[str, Any]:
                 # Single batch response
                 return {
                     'success': True,
-                    'total': len(gps_data_list),
-                    'successful': len(gps_data_list),
+                    'total': point_count,
+                    'successful': point_count,
                     'failed': 0,
                     'message': body.get('status', 'Batch processed')
                 }
@@ -234,13 +515,79 @@ def submit_gps_batch(gps_data_list: List[Dict[str, Any]]) -> Dict[str, Any]:
             return {
                 'success': False,
                 'error': response_payload.get('body', 'Unknown error'),
-                'total': len(gps_data_list),
+                'total': point_count,
                 'successful': 0,
-                'failed': len(gps_data_list)
+                'failed': point_count
             }
             
     except Exception as e:
         print(f"   ❌ Error invoking lambda: {e}")
+        return {
+            'success': False,
+            'error': str(e),
+            'total': point_count,
+            'successful': 0,
+            'failed': point_count
+        }
+
+def prefetch(items: Iterable[Any], maxsize: int) -> Iterator[Any]:
+    """
+    Produce items on a background thread, at most maxsize ahead of the consumer.
+    The bounded queue applies backpressure; producer errors are re-raised at the end.
+    """
+    items_queue = queue.Queue(maxsize=maxsize)
+    done = object()
+    errors = []
+    
+    def produce():
+        try:
+            for item in items:
+                items_queue.put(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            items_queue.put(done)
+    
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    while True:
+        item = items_queue.get()
+        if item is done:
+            break
+        yield item
+    producer.join()
+    if errors:
+        raise errors[0]
+
+def submit_payloads(payloads: Iterable[Tuple[bytes, int]]) -> Dict[str, Any]:
+    """
+    Invoke the lambda function once per payload and add up the results.
+    Payloads are sent one after another so the points arrive in order, while
+    the next ones are packed in the background during each invocation.
+    """
+    totals = {'success': True, 'total': 0, 'successful': 0, 'failed': 0}
+    for payload, point_count in prefetch(payloads, PAYLOAD_QUEUE_SIZE):
+        result = invoke_gps_payload(payload, point_count)
+        if not result['success']:
+            totals['success'] = False
+            totals.setdefault('error', result['error'])
+        totals['total'] += result['total']
+        totals['successful'] += result['successful']
+        totals['failed'] += result['failed']
+    
+    return totals
+
+def submit_gps_batch(gps_data_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Submit a batch of GPS data to the lambda function for processing.
+    Batches above the synchronous invocation limit are split into several payloads.
+    """
+    print(f"📤 Submitting batch of {len(gps_data_list)} GPS points to lambda...")
+    
+    try:
+        payloads = build_payloads(gps_data_list)
+    except Exception as e:
+        print(f"   ❌ Error serializing GPS points: {e}")
         return {
             'success': False,
             'error': str(e),
@@ -248,27 +595,16 @@ def submit_gps_batch(gps_data_list: List[Dict[str, Any]]) -> Dict[str, Any]:
             'successful': 0,
             'failed': len(gps_data_list)
         }
+    
+    return submit_payloads(payloads)
 
-def resubmit_jsonl_file(file_path: str) -> Dict[str, int]:
-    """Resubmit all data from a JSONL file to the lambda function as a single batch."""
+def resubmit_jsonl_file(
+    file_path: str, points: List[Tuple[int, bytes]], parse_errors: int = 0
+) -> Dict[str, int]:
+    """Resubmit the GPS points loaded by analyze_and_load to the lambda function."""
     print(f"\n🚀 Resubmitting data from: {os.path.basename(file_path)}")
     
-    gps_data_list = []
-    parse_errors = 0
-    
-    # Read all GPS data from file
-    with open(file_path, 'r') as f:
-        for line_num, line in enumerate(f, 1):
-            if line.strip():
-                try:
-                    data = json.loads(line.strip())
-                    gps_data_list.append(data)
-                except json.JSONDecodeError as e:
-                    print(f"   ⚠️  Error parsing line {line_num}: {e}")
-                    parse_errors += 1
-                    continue
-    
-    if not gps_data_list:
+    if not points:
         print("   ❌ No valid GPS data found in file")
         return {
             'total': 0,
@@ -277,16 +613,21 @@ def resubmit_jsonl_file(file_path: str) -> Dict[str, int]:
             'parse_errors': parse_errors
         }
     
-    # Sort by timestamp to ensure chronological order
-    gps_data_list.sort(key=lambda x: x.get('timestamp', 0))
-    print(f"   📊 Loaded {len(gps_data_list)} GPS points (chronologically sorted)")
+    # Sort by timestamp to ensure chronological order. The daily logs are
+    # append-only and nearly always in order already, so check that first
+    # with one C-level pass over neighbouring pairs
+    timestamps = list(map(itemgetter(0), points))
+    if any(map(gt, timestamps, islice(timestamps, 1, None))):
+        points.sort(key=itemgetter(0))
+    print(f"   📊 Loaded {len(points)} GPS points (chronologically sorted)")
     
-    # Submit entire batch to lambda
-    result = submit_gps_batch(gps_data_list)
+    # Submit to lambda, packing payloads as the sorted points are consumed
+    print(f"📤 Submitting batch of {len(points)} GPS points to lambda...")
+    result = submit_payloads(pack_payloads(encoded for _, encoded in points))
     
     # Prepare stats
     stats = {
-        'total': len(gps_data_list),
+        'total': len(points),
         'success': result.get('successful', 0),
         'failed': result.get('failed', 0) + parse_errors,
         'parse_errors': parse_errors,
@@ -307,30 +648,39 @@ def process_batch(batch: List[Dict[str, Any]], stats: Dict[str, int]):
     """Legacy function - no longer used with batch processing."""
     pass
 
-def reprocess_file(file_path: str, dry_run: bool = False) -> bool:
-    """Reprocess a single JSONL file."""
+def reprocess_file(
+    file_path: str, dry_run: bool = False, auto_confirm: bool = False, use_cache: bool = True
+) -> bool:
+    """
+    Reprocess a single JSONL file; auto_confirm skips the confirmation prompt.
+    use_cache=False forces a fresh dry-run analysis.
+    """
     print(f"\n{'='*60}")
     print(f"🔄 Processing: {os.path.basename(file_path)}")
     print(f"{'='*60}")
     
-    # Analyze the file
-    info = analyze_jsonl_file(file_path)
-    if not info:
-        return False
-    
     if dry_run:
+        # Only the time range is needed, so read just the boundary records
+        if not analyze_jsonl_file(file_path, use_cache):
+            return False
         print("🔍 DRY RUN - No actual changes will be made")
         return True
     
+    # Analyze the file and keep its points for the resubmission
+    info, points = analyze_and_load(file_path)
+    if not info:
+        return False
+    
     # Confirm before proceeding
     print(f"\n⚠️  About to:")
     print(f"   1. Delete {info['line_count']} potential records from DynamoDB")
     print(f"   2. Resubmit {info['line_count']} GPS points to lambda")
     
-    confirm = input("\n🤔 Proceed? (yes/no): ").lower().strip()
-    if confirm != 'yes':
-        print("❌ Cancelled by user")
-        return False
+    if not auto_confirm:
+        confirm = input("\n🤔 Proceed? (yes/no): ").lower().strip()
+        if confirm != 'yes':
+            print("❌ Cancelled by user")
+            return False
     
     # Delete old data for each device ID
     total_deleted = 0
@@ -343,7 +693,7 @@ def reprocess_file(file_path: str, dry_run: bool = False) -> bool:
         total_deleted += deleted
     
     # Resubmit data
-    resubmit_stats = resubmit_jsonl_file(file_path)
+    resubmit_stats = resubmit_jsonl_file(file_path, points, info['parse_errors'])
     
     print(f"\n✅ File processing complete!")
     print(f"   🗑️  Deleted: {total_deleted} old records")
@@ -351,8 +701,18 @@ def reprocess_file(file_path: str, dry_run: bool = False) -> bool:
     
     return True
 
-def main():
-    """Main function to reprocess all GPS data files."""
+def main(
+    dry_run: Optional[bool] = None,
+    auto_confirm: bool = False,
+    workers: int = 1,
+    use_cache: bool = True,
+):
+    """
+    Main function to reprocess all GPS data files.
+    The run mode is asked for interactively unless dry_run is given, and
+    auto_confirm answers the per-file confirmation with yes. With workers > 1
+    the files are processed in parallel worker processes, which cannot prompt.
+    """
     print("🔄 GPS Data Reprocessing Tool")
     print("Enhanced with temporal-aware outlier detection")
     print("="*60)
@@ -380,8 +740,9 @@ def main():
         print(f"   📄 {os.path.basename(f)}")
     
     # Option for dry run
-    mode = input("\n🤔 Run mode? (dry/real): ").lower().strip()
-    dry_run = mode == 'dry'
+    if dry_run is None:
+        mode = input("\n🤔 Run mode? (dry/real): ").lower().strip()
+        dry_run = mode == 'dry'
     
     if dry_run:
         print("🔍 Running in DRY RUN mode - no changes will be made")
@@ -391,23 +752,44 @@ def main():
     # Process each file
     total_stats = {'processed': 0, 'success': 0, 'failed': 0}
     
-    for file_path in jsonl_files:
+    if workers > 1:
+        # Files are independent, so they can run in separate processes
         try:
-            success = reprocess_file(file_path, dry_run)
-            total_stats['processed'] += 1
-            
-            if success:
-                total_stats['success'] += 1
-            else:
-                total_stats['failed'] += 1
-                
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(
+                        reprocess_file, file_path, dry_run, auto_confirm, use_cache
+                    ): file_path
+                    for file_path in jsonl_files
+                }
+                for future in as_completed(futures):
+                    try:
+                        success = future.result()
+                        total_stats['processed'] += 1
+                        total_stats['success' if success else 'failed'] += 1
+                    except Exception as e:
+                        print(f"\n❌ Error processing {os.path.basename(futures[future])}: {e}")
+                        total_stats['failed'] += 1
         except KeyboardInterrupt:
             print("\n❌ Process interrupted by user")
-            break
-        except Exception as e:
-            print(f"\n❌ Error processing {os.path.basename(file_path)}: {e}")
-            total_stats['failed'] += 1
-            continue
+    else:
+        for file_path in jsonl_files:
+            try:
+                success = reprocess_file(file_path, dry_run, auto_confirm, use_cache)
+                total_stats['processed'] += 1
+                
+                if success:
+                    total_stats['success'] += 1
+                else:
+                    total_stats['failed'] += 1
+                    
+            except KeyboardInterrupt:
+                print("\n❌ Process interrupted by user")
+                break
+            except Exception as e:
+                print(f"\n❌ Error processing {os.path.basename(file_path)}: {e}")
+                total_stats['failed'] += 1
+                continue
     
     print(f"\n{'='*60}")
     print("🏁 REPROCESSING COMPLETE")
@@ -423,5 +805,29 @@ def main():
     
     return 0
 
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options for unattended runs."""
+    parser = argparse.ArgumentParser(description="Reprocess GPS JSONL logs through the processing lambda")
+    parser.add_argument('--dry-run', action='store_true', help="only analyze the files, change nothing")
+    parser.add_argument('--yes', action='store_true', help="run without prompts (real mode unless --dry-run)")
+    parser.add_argument('--workers', type=int, default=1, help="number of files processed in parallel")
+    parser.add_argument('--no-cache', action='store_true', help="ignore cached dry-run analyses")
+    args = parser.parse_args(argv)
+    if args.workers > 1 and not (args.yes or args.dry_run):
+        parser.error("--workers needs --yes or --dry-run; worker processes cannot prompt")
+    return args
+
 if __name__ == "__main__":
-    sys.exit(main()) 
\ No newline at end of file
+    args = parse_args()
+    if args.dry_run:
+        run_dry = True
+    elif args.yes:
+        run_dry = False
+    else:
+        run_dry = None  # ask interactively
+    sys.exit(main(
+        dry_run=run_dry,
+        auto_confirm=args.yes,
+        workers=args.workers,
+        use_cache=not args.no_cache,
+    )) 
\ No newline at end of file
@@ -7,17 +7,16 @@ from datetime import datetime
 import json
 import os
 import sys
-import time
 
 import boto3
-import requests
+
+from reprocess_gps_data import CLIENT_CONFIG, query_record_keys, submit_gps_batch
 
 # Configuration
 DYNAMODB_TABLE = "gps-tracking-service-dev-locations-v2"
-LAMBDA_ENDPOINT = "https://cfqttt9fvi.execute-api.eu-central-1.amazonaws.com/drivers-log"
 
 # Initialize AWS client
-dynamodb = boto3.resource('dynamodb', region_name='eu-central-1')
+dynamodb = boto3.resource('dynamodb', region_name='eu-central-1', config=CLIENT_CONFIG)
 table = dynamodb.Table(DYNAMODB_TABLE)
 
 def reprocess_file(file_path):
@@ -26,8 +25,8 @@ def reprocess_file(file_path):
     print("=" * 60)
     
     # Read and analyze file
-    with open(file_path, 'r') as f:
-        lines = [line.strip() for line in f if line.strip()]
+    with open(file_path, 'rb') as f:
+        lines = [line for line in f if line.strip()]
     
     first_data = json.loads(lines[0])
     last_data = json.loads(lines[-1])
@@ -42,16 +41,7 @@ def reprocess_file(file_path):
     
     # Check existing data
     try:
-        response = table.query(
-            KeyConditionExpression='id = :device_id AND #ts BETWEEN :start_ts AND :end_ts',
-            ExpressionAttributeNames={'#ts': 'timestamp'},
-            ExpressionAttributeValues={
-                ':device_id': device_id,
-                ':start_ts': start_ts,
-                ':end_ts': end_ts
-            }
-        )
-        existing_items = response.get('Items', [])
+        existing_items = query_record_keys(table, device_id, start_ts, end_ts)
         print(f"🗑️  Will delete {len(existing_items)} existing records")
         
     except Exception as e:
@@ -61,50 +51,34 @@ def reprocess_file(file_path):
     # Delete existing data
     print(f"\n🗑️  Deleting existing data...")
     deleted_count = 0
-    for item in existing_items:
-        try:
-            table.delete_item(
-                Key={
-                    'id': item['id'],
-                    'timestamp': item['timestamp']
-                }
-            )
-            deleted_count += 1
-            if deleted_count % 50 == 0:
-                print(f"   Deleted {deleted_count}/{len(existing_items)} records...")
-        except Exception as e:
-            print(f"   ⚠️  Error deleting record: {e}")
+    try:
+        with table.batch_writer() as batch:
+            for item in existing_items:
+                batch.delete_item(
+                    Key={
+                        'id': item['id'],
+                        'timestamp': item['timestamp']
+                    }
+                )
+                deleted_count += 1
+                if deleted_count % 50 == 0:
+                    print(f"   Deleted {deleted_count}/{len(existing_items)} records...")
+    except Exception as e:
+        print(f"   ⚠️  Error deleting records: {e}")
     
     print(f"✅ Deleted {deleted_count} records")
     
-    # Resubmit data
+    # Resubmit data as one batch invocation of the processing lambda
     print(f"\n🚀 Resubmitting {len(lines)} GPS points...")
-    success_count = 0
-    batch_count = 0
-    
+    gps_data_list = []
     for i, line in enumerate(lines):
         try:
-            data = json.loads(line)
-            
-            response = requests.post(
-                LAMBDA_ENDPOINT,
-                json=data,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                success_count += 1
-            else:
-                print(f"   ⚠️  Failed to submit point {i+1}: {response.status_code}")
-                
-            # Progress and rate limiting
-            if (i + 1) % 50 == 0:
-                print(f"   📤 Submitted {i+1}/{len(lines)} points...")
-                time.sleep(0.5)  # Rate limiting
-                
-        except Exception as e:
-            print(f"   ❌ Error submitting point {i+1}: {e}")
+            gps_data_list.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            print(f"   ❌ Error parsing point {i+1}: {e}")
+    
+    result = submit_gps_batch(gps_data_list)
+    success_count = result.get('successful', 0)
     
     print(f"✅ Resubmitted {success_count}/{len(lines)} points successfully")
     
@@ -1,14 +1,16 @@
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+import hashlib
 import json
 import math
 import os
+import re
+import threading
 import time
-from typing import Any, Dict, Optional
-import urllib.parse
+from typing import Any, Dict, List, Optional, Tuple
 
-import boto3
-import requests
+from botocore.exceptions import ClientError
 
 # Let API Gateway handle CORS
 
@@ -22,87 +24,503 @@ def decimal_default(obj):
     raise TypeError
 
 
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371000  # Earth radius in meters
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = (
-        math.sin(dphi / 2) ** 2
-        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    )
-    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+# json.dumps(..., default=...) builds a new encoder on every call; responses
+# reuse this one instead
+response_encoder = json.JSONEncoder(default=decimal_default, check_circular=False)
+
 
+# Earth diameter in meters (2 * 6371000), the factor in front of asin
+_R2 = 12742000.0
+# Length of one degree of arc on the same sphere (~111195 m)
+_M_PER_DEG = _R2 * math.pi / 360
+# Degrees to radians as plain multiplies, with the half-angle folded in
+_RAD = math.pi / 180
+_HALF_RAD = math.pi / 360
 
-# DynamoDB setup
-dynamodb = boto3.resource("dynamodb")
-geocode_cache_table = dynamodb.Table(
-    os.environ.get(
-        "DYNAMODB_GEOCODE_CACHE_TABLE", "gps-tracking-service-dev-geocode-cache"
+
+def haversine(lat1, lon1, lat2, lon2):
+    s_phi = math.sin((lat2 - lat1) * _HALF_RAD)
+    s_lambda = math.sin((lon2 - lon1) * _HALF_RAD)
+    a = (
+        s_phi * s_phi
+        + math.cos(lat1 * _RAD) * math.cos(lat2 * _RAD) * s_lambda * s_lambda
     )
+    # 2*atan2(sqrt(a), sqrt(1-a)) == 2*asin(sqrt(a)) for a in [0, 1]; clamp
+    # rounding just above 1 for antipodal points
+    if a > 1.0:
+        a = 1.0
+    return _R2 * math.asin(math.sqrt(a))
+
+
+def equirectangular(lat1, lon1, lat2, lon2):
+    """Flat-earth distance approximation in meters, accurate over short ranges"""
+    dlon = abs(lon2 - lon1)
+    if dlon > 180:
+        dlon = 360 - dlon  # Shorter way round across the antimeridian
+    x = dlon * math.cos((lat1 + lat2) * _HALF_RAD)
+    y = lat2 - lat1
+    return _M_PER_DEG * math.sqrt(x * x + y * y)
+
+
+def haversine_many(
+    lat1: float, lon1: float, points: List[Tuple[float, float]]
+) -> List[float]:
+    """Distances in meters from one origin to many points"""
+    # Origin terms are shared by every pair, so compute them once
+    cos_phi1 = math.cos(lat1 * _RAD)
+    sin, cos, asin, sqrt = math.sin, math.cos, math.asin, math.sqrt
+
+    distances = []
+    for lat2, lon2 in points:
+        s_phi = sin((lat2 - lat1) * _HALF_RAD)
+        s_lambda = sin((lon2 - lon1) * _HALF_RAD)
+        a = s_phi * s_phi + cos_phi1 * cos(lat2 * _RAD) * s_lambda * s_lambda
+        distances.append(_R2 * asin(sqrt(min(a, 1.0))))
+    return distances
+
+
+# DynamoDB and Nominatim clients are created on first use, so operations
+# that need neither (validate) don't pay for importing boto3 and requests
+# on a cold start
+GEOCODE_CACHE_TABLE = os.environ.get(
+    "DYNAMODB_GEOCODE_CACHE_TABLE", "gps-tracking-service-dev-geocode-cache"
 )
+dynamodb = None
+geocode_cache_table = None
+nominatim_session = None
+client_init_lock = threading.Lock()
+
+
+def get_dynamodb():
+    """DynamoDB resource for the geocode cache"""
+    global dynamodb
+    if dynamodb is None:
+        with client_init_lock:
+            if dynamodb is None:
+                import boto3
+                from botocore.config import Config
+
+                # Cache hits are the common path, so keep the connection warm
+                # across invocations and fail fast: a slow cache read falls
+                # through to Nominatim instead of stalling the request.
+                config = Config(
+                    connect_timeout=1,
+                    read_timeout=2,
+                    retries={"max_attempts": 2, "mode": "standard"},
+                    tcp_keepalive=True,
+                )
+                dynamodb = boto3.resource("dynamodb", config=config)
+    return dynamodb
+
+
+def get_cache_table():
+    """The geocode cache table
+
+    boto3 resources are not thread-safe; Nominatim worker threads go through
+    get_dynamodb().meta.client instead of this table.
+    """
+    global geocode_cache_table
+    if geocode_cache_table is None:
+        resource = get_dynamodb()
+        with client_init_lock:
+            if geocode_cache_table is None:
+                geocode_cache_table = resource.Table(GEOCODE_CACHE_TABLE)
+    return geocode_cache_table
+
 
 # Nominatim configuration
 NOMINATIM_USER_AGENT = "location-tracker-app/1.0"  # Required by Nominatim usage policy
 NOMINATIM_REVERSE_API = "https://nominatim.openstreetmap.org/reverse"
 NOMINATIM_SEARCH_API = "https://nominatim.openstreetmap.org/search"
+NOMINATIM_TIMEOUT = 5  # seconds, keeps a slow lookup from holding the lambda
+# Concurrent lookups for batch misses: a request can be in flight while the
+# next one waits for its rate limit slot
+NOMINATIM_WORKERS = 4
 MAX_ADDRESS_DISTANCE = 1000  # Maximum distance (meters) for a valid address
+# Within this band around the limit the approximation is not trusted and
+# the exact haversine distance decides
+APPROX_DISTANCE_MARGIN = 0.05
+
+# First three comma separated parts of a display name, surrounding whitespace
+# trimmed (same result as split(",") and strip() without building the list)
+ADDRESS_PARTS_PATTERN = re.compile(
+    r"\s*([^,]*?)\s*,\s*([^,]*?)\s*,\s*([^,]*?)\s*(?:,|$)"
+)
+
+# Search query canonicalization: punctuation and spacing don't change what
+# Nominatim finds, and common street abbreviations are spelled out
+QUERY_PUNCTUATION_PATTERN = re.compile(r"[^\w\s-]+")
+QUERY_ABBREVIATIONS = {
+    "str": "strasse",
+    "st": "street",
+    "rd": "road",
+    "ave": "avenue",
+    "av": "avenue",
+    "blvd": "boulevard",
+    "pl": "platz",
+    "dr": "drive",
+}
+# German street names abbreviate a trailing "strasse" too ("Hauptstr.")
+QUERY_STREET_SUFFIX_PATTERN = re.compile(r"(?<=\w)str$")
+
+# Cache entries expire through the table's native TTL on expires_at
+CACHE_TTL_SECONDS = 30 * 24 * 3600
+# Fields kept in a cache entry; Nominatim's raw response is not stored
+CACHED_FIELDS = (
+    "address",
+    "formatted_address",
+    "lat",
+    "lon",
+    "operation",
+    "cache_key",
+    "expires_at",
+)
+
+# Warm containers keep recent entries in memory in front of DynamoDB; the
+# short lifetime lets entries rewritten by other containers show up
+LOCAL_CACHE_SIZE = 4096
+LOCAL_CACHE_SECONDS = 600
+local_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_LIMIT = 100
+BATCH_GET_ATTEMPTS = 5
+
+
+def get_nominatim_session():
+    """HTTP session for Nominatim
+
+    One session per container keeps the TLS connection alive between lookups.
+    """
+    global nominatim_session
+    if nominatim_session is None:
+        with client_init_lock:
+            if nominatim_session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                session = requests.Session()
+                session.headers["User-Agent"] = NOMINATIM_USER_AGENT
+                session.mount(
+                    "https://",
+                    HTTPAdapter(
+                        pool_connections=2,
+                        pool_maxsize=8,
+                        max_retries=Retry(
+                            total=2,
+                            backoff_factor=0.5,
+                            status_forcelist=[429, 502, 503, 504],
+                        ),
+                    ),
+                )
+                nominatim_session = session
+    return nominatim_session
+
 
 # Rate limiting
 last_request_time = 0
+throttle_lock = threading.Lock()
+
+# Nominatim's 1 request/second limit applies to the whole fleet of lambda
+# containers, so request slots are handed out from a shared cache table item
+THROTTLE_CACHE_KEY = "__nominatim_throttle__"
+RATE_LIMIT_DELAY_MS = int(RATE_LIMIT_DELAY * 1000)
+MAX_THROTTLE_QUEUE_MS = 60000  # Give up rather than queue further ahead
+
+
+class RateLimitExceeded(Exception):
+    """Raised when the shared Nominatim request queue is too long"""
+
+
+def reserve_request_slot() -> int:
+    """Reserve the next fleet-wide Nominatim request slot (epoch milliseconds)
+
+    Batch lookups call this from several threads, so it uses the thread-safe
+    low-level client rather than the shared table resource.
+    """
+    client = get_dynamodb().meta.client
+    key = {"cache_key": THROTTLE_CACHE_KEY}
+    now_ms = int(time.time() * 1000)
+
+    # Idle limiter: the slot is free now, claim it and push the next one out
+    try:
+        client.update_item(
+            TableName=GEOCODE_CACHE_TABLE,
+            Key=key,
+            UpdateExpression="SET next_slot = :next",
+            ConditionExpression="attribute_not_exists(next_slot) OR next_slot <= :now",
+            ExpressionAttributeValues={
+                ":now": now_ms,
+                ":next": now_ms + RATE_LIMIT_DELAY_MS,
+            },
+        )
+        return now_ms
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+
+    # Busy limiter: queue behind the last reserved slot
+    try:
+        response = client.update_item(
+            TableName=GEOCODE_CACHE_TABLE,
+            Key=key,
+            UpdateExpression="SET next_slot = next_slot + :delay",
+            ConditionExpression="next_slot < :cap",
+            ExpressionAttributeValues={
+                ":delay": RATE_LIMIT_DELAY_MS,
+                ":cap": now_ms + MAX_THROTTLE_QUEUE_MS,
+            },
+            ReturnValues="UPDATED_OLD",
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            raise RateLimitExceeded("Nominatim request queue is full")
+        raise
+    return int(response["Attributes"]["next_slot"])
 
 
 def throttle_requests():
     """Ensure we don't exceed rate limits"""
     global last_request_time
-    current_time = time.time()
-    time_since_last_request = current_time - last_request_time
+    try:
+        slot_ms = reserve_request_slot()
+    except RateLimitExceeded:
+        raise
+    except Exception as e:
+        # Shared limiter unavailable, fall back to this container's own pacing
+        print(f"Shared throttle error: {str(e)}")
+        throttle_requests_locally()
+        return
 
-    if time_since_last_request < RATE_LIMIT_DELAY:
-        sleep_time = RATE_LIMIT_DELAY - time_since_last_request
-        time.sleep(sleep_time)
+    wait = slot_ms / 1000 - time.time()
+    if wait > 0:
+        time.sleep(wait)
 
     last_request_time = time.time()
 
 
+def throttle_requests_locally():
+    """Space out requests made by this container"""
+    global last_request_time
+    with throttle_lock:
+        current_time = time.time()
+        time_since_last_request = current_time - last_request_time
+
+        if time_since_last_request < RATE_LIMIT_DELAY:
+            sleep_time = RATE_LIMIT_DELAY - time_since_last_request
+            time.sleep(sleep_time)
+
+        last_request_time = time.time()
+
+
+def reverse_cache_key(lat: float, lon: float) -> str:
+    """Build the cache key for a reverse geocoding lookup
+
+    Coordinates are snapped to a 4 decimal grid (~11 m), about the precision
+    of a building level lookup, so nearby GPS fixes share one entry.
+    """
+    return f"rev_{lat:.4f}_{lon:.4f}"
+
+
+def search_cache_key(query: str) -> str:
+    """Build the cache key for an address search from its canonical form"""
+    # casefold() also folds "ß" to "ss"
+    tokens = QUERY_PUNCTUATION_PATTERN.sub(" ", query.casefold()).split()
+    canonical = " ".join(
+        QUERY_STREET_SUFFIX_PATTERN.sub("strasse", QUERY_ABBREVIATIONS.get(t, t))
+        for t in tokens
+    )
+    digest = hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+    return f"search_{digest}"
+
+
+def is_cache_entry_fresh(cached_item: Dict[str, Any]) -> bool:
+    """Check if a cache entry has not expired yet
+
+    DynamoDB deletes expired items lazily (up to a couple of days late), so
+    the expiry is checked on read as well.
+    """
+    return cached_item.get("expires_at", 0) > int(time.time())
+
+
+def local_cache_get(cache_key: str) -> Optional[Dict[str, Any]]:
+    """Look up an entry in this container's in-memory cache"""
+    entry = local_cache.get(cache_key)
+    if entry is None:
+        return None
+
+    stored_at, cached_item = entry
+    expired = time.monotonic() - stored_at > LOCAL_CACHE_SECONDS
+    if expired or not is_cache_entry_fresh(cached_item):
+        del local_cache[cache_key]
+        return None
+
+    local_cache.move_to_end(cache_key)
+    return cached_item
+
+
+def local_cache_put(cache_key: str, cached_item: Dict[str, Any]) -> None:
+    """Remember an entry in memory, evicting the least recently used one"""
+    local_cache[cache_key] = (time.monotonic(), cached_item)
+    local_cache.move_to_end(cache_key)
+    if len(local_cache) > LOCAL_CACHE_SIZE:
+        local_cache.popitem(last=False)
+
+
 def get_address_from_cache(cache_key: str) -> Optional[Dict[str, Any]]:
     """Try to get an address from the cache"""
+    cached_item = local_cache_get(cache_key)
+    if cached_item:
+        return cached_item
+
     try:
-        response = geocode_cache_table.get_item(Key={"cache_key": cache_key})
+        response = get_cache_table().get_item(Key={"cache_key": cache_key})
         if "Item" in response:
-            # Check if cache entry is still valid (30 days)
             cached_item = response["Item"]
-            cache_time = datetime.fromisoformat(cached_item["timestamp"])
-            if datetime.now() - cache_time < timedelta(days=30):
+            if is_cache_entry_fresh(cached_item):
+                local_cache_put(cache_key, cached_item)
                 return cached_item
     except Exception as e:
         print(f"Cache retrieval error: {str(e)}")
     return None
 
 
+def batch_get_cached(keys: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fetch fresh cache entries for many keys, 100 keys per BatchGetItem call"""
+    table_name = GEOCODE_CACHE_TABLE
+    found: Dict[str, Dict[str, Any]] = {}
+
+    # Only keys missing from memory go to DynamoDB
+    unique_keys = []
+    for cache_key in dict.fromkeys(keys):
+        cached_item = local_cache_get(cache_key)
+        if cached_item:
+            found[cache_key] = cached_item
+        else:
+            unique_keys.append(cache_key)
+
+    for start in range(0, len(unique_keys), BATCH_GET_LIMIT):
+        chunk = unique_keys[start : start + BATCH_GET_LIMIT]
+        request_items = {table_name: {"Keys": [{"cache_key": k} for k in chunk]}}
+
+        for attempt in range(BATCH_GET_ATTEMPTS):
+            try:
+                response = get_dynamodb().batch_get_item(RequestItems=request_items)
+            except Exception as e:
+                print(f"Cache batch retrieval error: {str(e)}")
+                break
+
+            for item in response.get("Responses", {}).get(table_name, []):
+                if is_cache_entry_fresh(item):
+                    found[item["cache_key"]] = item
+                    local_cache_put(item["cache_key"], item)
+
+            # Throttled keys come back unprocessed; retry them with backoff
+            request_items = response.get("UnprocessedKeys")
+            if not request_items:
+                break
+            time.sleep(0.05 * (2**attempt))
+
+    return found
+
+
 def save_address_to_cache(cache_key: str, address_data: Dict[str, Any]) -> None:
     """Save an address to the cache"""
     try:
-        # Include timestamp for cache expiration
+        # Include expiry (epoch seconds) for the table's TTL
         address_data["cache_key"] = cache_key
-        address_data["timestamp"] = datetime.now().isoformat()
-
-        geocode_cache_table.put_item(Item=address_data)
+        address_data["expires_at"] = int(time.time()) + CACHE_TTL_SECONDS
+
+        # DynamoDB rejects floats, so store them as Decimal
+        fields = {k: address_data[k] for k in CACHED_FIELDS if k in address_data}
+        item = json.loads(json.dumps(fields), parse_float=Decimal)
+        local_cache_put(cache_key, item)
+
+        # Leave a live entry written by a concurrent lookup in place
+        get_cache_table().put_item(
+            Item=item,
+            ConditionExpression="attribute_not_exists(cache_key) OR expires_at < :now",
+            ExpressionAttributeValues={":now": int(time.time())},
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            print(f"Cache save error: {str(e)}")
     except Exception as e:
         print(f"Cache save error: {str(e)}")
 
 
 def reverse_geocode(lat: float, lon: float) -> Dict[str, Any]:
     """Get address from coordinates with caching"""
-    # Create a cache key from lat/lon
-    cache_key = f"rev_{lat:.6f}_{lon:.6f}"
+    cache_key = reverse_cache_key(lat, lon)
 
     # Check cache first
     cached_result = get_address_from_cache(cache_key)
     if cached_result:
-        return cached_result
+        # The entry may have been stored for another fix in the same cell
+        return {**cached_result, "lat": lat, "lon": lon}
+
+    return fetch_reverse_geocode(lat, lon, cache_key)
+
+
+def reverse_geocode_many(points: List[Tuple[float, float]]) -> List[Dict[str, Any]]:
+    """Get addresses for many coordinates, fetching all cache hits in one batch"""
+    cache_keys = [reverse_cache_key(lat, lon) for lat, lon in points]
+    results = batch_get_cached(cache_keys)
+
+    # Only the misses go to Nominatim, once per distinct key
+    misses = {}
+    for point, cache_key in zip(points, cache_keys):
+        if cache_key not in results:
+            misses.setdefault(cache_key, point)
+
+    if misses:
+        with ThreadPoolExecutor(max_workers=NOMINATIM_WORKERS) as executor:
+            lookups = list(
+                executor.map(
+                    request_reverse_geocode,
+                    [lat for lat, _ in misses.values()],
+                    [lon for _, lon in misses.values()],
+                )
+            )
+
+        # Cache writes stay on this thread
+        for (cache_key, (lat, lon)), result in zip(misses.items(), lookups):
+            if result:
+                save_address_to_cache(cache_key, result)
+            else:
+                result = reverse_geocode_failure(lat, lon)
+            results[cache_key] = result
 
-    # Not in cache, make API request
+    return [
+        {**results[cache_key], "lat": lat, "lon": lon}
+        for (lat, lon), cache_key in zip(points, cache_keys)
+    ]
+
+
+def fetch_reverse_geocode(lat: float, lon: float, cache_key: str) -> Dict[str, Any]:
+    """Look up coordinates with Nominatim and cache the result"""
+    result = request_reverse_geocode(lat, lon)
+    if not result:
+        return reverse_geocode_failure(lat, lon)
+
+    save_address_to_cache(cache_key, result)
+    return result
+
+
+def reverse_geocode_failure(lat: float, lon: float) -> Dict[str, Any]:
+    """Minimal info returned when geocoding fails"""
+    return {
+        "address": "Location lookup failed",
+        "lat": lat,
+        "lon": lon,
+        "error": "Geocoding failed",
+        "operation": "reverse",
+    }
+
+
+def request_reverse_geocode(lat: float, lon: float) -> Optional[Dict[str, Any]]:
+    """Ask Nominatim for the address at the coordinates, None if that fails"""
     try:
         # Apply rate limiting
         throttle_requests()
@@ -115,9 +533,9 @@ def reverse_geocode(lat: float, lon: float) -> Dict[str, Any]:
             "addressdetails": 1,
         }
 
-        headers = {"User-Agent": NOMINATIM_USER_AGENT}
-
-        response = requests.get(NOMINATIM_REVERSE_API, params=params, headers=headers)
+        response = get_nominatim_session().get(
+            NOMINATIM_REVERSE_API, params=params, timeout=NOMINATIM_TIMEOUT
+        )
 
         if response.status_code == 200:
             data = response.json()
@@ -127,50 +545,36 @@ def reverse_geocode(lat: float, lon: float) -> Dict[str, Any]:
             if data and "display_name" in data:
                 # Process and format the address
                 display_name = data["display_name"]
-                parts = display_name.split(",")
+                parts = ADDRESS_PARTS_PATTERN.match(display_name)
 
-                if len(parts) >= 3:
+                if parts:
                     # Typically: street, area/district, city, etc.
-                    address = (
-                        f"{parts[0].strip()}, {parts[1].strip()}, {parts[2].strip()}"
-                    )
+                    address = f"{parts[1]}, {parts[2]}, {parts[3]}"
                 else:
                     address = display_name
 
-            result = {
+            return {
                 "address": address,
                 "lat": lat,
                 "lon": lon,
                 "raw_response": data,
                 "operation": "reverse",
             }
-
-            # Save to cache
-            save_address_to_cache(cache_key, result)
-
-            return result
     except Exception as e:
         print(f"Geocoding error: {str(e)}")
 
-    # Return minimal info if geocoding fails
-    return {
-        "address": "Location lookup failed",
-        "lat": lat,
-        "lon": lon,
-        "error": "Geocoding failed",
-        "operation": "reverse",
-    }
+    return None
 
 
 def geocode_search(query: str) -> Dict[str, Any]:
     """Search for an address and get coordinates with caching"""
-    # Create a cache key from the query
-    cache_key = f"search_{urllib.parse.quote(query.lower())}"
+    cache_key = search_cache_key(query)
 
     # Check cache first
     cached_result = get_address_from_cache(cache_key)
     if cached_result:
-        return cached_result
+        # The entry may have been stored for a differently spelled query
+        return {**cached_result, "address": query}
 
     # Not in cache, make API request
     try:
@@ -179,9 +583,9 @@ def geocode_search(query: str) -> Dict[str, Any]:
 
         params = {"q": query, "format": "json", "limit": 1}
 
-        headers = {"User-Agent": NOMINATIM_USER_AGENT}
-
-        response = requests.get(NOMINATIM_SEARCH_API, params=params, headers=headers)
+        response = get_nominatim_session().get(
+            NOMINATIM_SEARCH_API, params=params, timeout=NOMINATIM_TIMEOUT
+        )
 
         if response.status_code == 200:
             data = response.json()
@@ -212,7 +616,15 @@ def validate_address_coordinates(
     orig_lat: float, orig_lon: float, new_lat: float, new_lon: float
 ) -> Dict[str, Any]:
     """Validate if the new coordinates are within allowed distance"""
-    distance = haversine(orig_lat, orig_lon, new_lat, new_lon)
+    # One cosine decides clear accepts and rejects; only results close to the
+    # limit pay for the exact haversine distance
+    distance = equirectangular(orig_lat, orig_lon, new_lat, new_lon)
+    if (
+        MAX_ADDRESS_DISTANCE * (1 - APPROX_DISTANCE_MARGIN)
+        <= distance
+        <= MAX_ADDRESS_DISTANCE * (1 + APPROX_DISTANCE_MARGIN)
+    ):
+        distance = haversine(orig_lat, orig_lon, new_lat, new_lon)
 
     if distance <= MAX_ADDRESS_DISTANCE:
         return {"valid": True, "distance": distance}
@@ -224,14 +636,33 @@ def validate_address_coordinates(
         }
 
 
+def validate_address_candidates(
+    orig_lat: float, orig_lon: float, candidates: List[Tuple[float, float]]
+) -> List[Dict[str, Any]]:
+    """Validate many candidate coordinates against one original position"""
+    return [
+        (
+            {"valid": True, "distance": distance}
+            if distance <= MAX_ADDRESS_DISTANCE
+            else {
+                "valid": False,
+                "distance": distance,
+                "error": f"Address is too far ({int(distance)}m)",
+            }
+        )
+        for distance in haversine_many(orig_lat, orig_lon, candidates)
+    ]
+
+
 def handler(event, context):
     """
     Handle geocoding requests
 
     This Lambda supports:
     - Reverse geocoding (coordinates to address)
+    - Batch reverse geocoding (JSON array of coordinates in the body)
     - Forward geocoding (address to coordinates)
-    - Address validation
+    - Address validation, single or against a list of candidates
     """
     # API Gateway will handle OPTIONS requests
 
@@ -247,10 +678,30 @@ def handler(event, context):
             except (json.JSONDecodeError, ValueError):
                 pass
 
+        # A JSON array body is a batch of coordinates to reverse geocode
+        points = None
+        if isinstance(body, list):
+            points, body = body, {}
+
         # Determine operation type
         operation = query_params.get("operation") or body.get("operation", "reverse")
 
-        if operation == "reverse":
+        if points is not None:
+            coordinates = [
+                (float(point.get("lat", 0)), float(point.get("lon", 0)))
+                for point in points
+            ]
+
+            if not coordinates or not all(lat and lon for lat, lon in coordinates):
+                return {
+                    "statusCode": 400,
+                    "headers": {"Content-Type": "application/json"},
+                    "body": json.dumps({"error": "Missing lat/lon parameters"}),
+                }
+
+            result = reverse_geocode_many(coordinates)
+
+        elif operation == "reverse":
             # Get coordinates from query params or body
             lat = float(query_params.get("lat") or body.get("lat", 0))
             lon = float(query_params.get("lon") or body.get("lon", 0))
@@ -281,17 +732,34 @@ def handler(event, context):
             # Validate if new coordinates are within range of original
             orig_lat = float(query_params.get("orig_lat") or body.get("orig_lat", 0))
             orig_lon = float(query_params.get("orig_lon") or body.get("orig_lon", 0))
-            new_lat = float(query_params.get("new_lat") or body.get("new_lat", 0))
-            new_lon = float(query_params.get("new_lon") or body.get("new_lon", 0))
-
-            if not all([orig_lat, orig_lon, new_lat, new_lon]):
+            candidates = body.get("candidates")
+
+            if candidates is not None:
+                # Batch validation: several new positions against one original
+                coordinates = [
+                    (float(c.get("lat", 0)), float(c.get("lon", 0))) for c in candidates
+                ]
+                has_coordinates = all([orig_lat, orig_lon]) and all(
+                    lat and lon for lat, lon in coordinates
+                )
+            else:
+                new_lat = float(query_params.get("new_lat") or body.get("new_lat", 0))
+                new_lon = float(query_params.get("new_lon") or body.get("new_lon", 0))
+                has_coordinates = all([orig_lat, orig_lon, new_lat, new_lon])
+
+            if not has_coordinates:
                 return {
                     "statusCode": 400,
                     "headers": {"Content-Type": "application/json"},
                     "body": json.dumps({"error": "Missing coordinate parameters"}),
                 }
 
-            result = validate_address_coordinates(orig_lat, orig_lon, new_lat, new_lon)
+            if candidates is not None:
+                result = validate_address_candidates(orig_lat, orig_lon, coordinates)
+            else:
+                result = validate_address_coordinates(
+                    orig_lat, orig_lon, new_lat, new_lon
+                )
 
         else:
             return {
@@ -303,7 +771,7 @@ def handler(event, context):
         return {
             "statusCode": 200,
             "headers": {"Content-Type": "application/json"},
-            "body": json.dumps(result, default=decimal_default),
+            "body": response_encoder.encode(result),
         }
 
     except Exception as e:
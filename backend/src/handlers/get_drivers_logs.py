@@ -1,19 +1,31 @@
+import base64
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from decimal import Decimal
 import json
+import logging
 import os
-import traceback
 
 import boto3
 from boto3.dynamodb.conditions import Key
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 # IMPORTANT: DynamoDB timestamp schema
 # The 'timestamp' field is a Number (representing UTC epoch timestamp in seconds)
 # This is used as the sort key in DynamoDB tables
 
-# Configure DynamoDB
-dynamodb = boto3.resource("dynamodb")
+# Configure DynamoDB; keep-alive lets warm containers reuse the HTTPS
+# connection instead of a new TLS handshake per invocation
+DYNAMODB_CONFIG = Config(
+    tcp_keepalive=True, retries={"mode": "adaptive", "max_attempts": 3}
+)
+dynamodb = boto3.resource("dynamodb", config=DYNAMODB_CONFIG)
+
+# Diagnostics go through a level-gated logger; LOG_LEVEL=DEBUG restores the
+# per-request trace without paying for it on every invocation
+logger = logging.getLogger(__name__)
+logger.setLevel(os.environ.get("LOG_LEVEL", "WARNING"))
 
 # Get table names from environment variables or use defaults (matching actual names in AWS)
 locations_table_name = os.environ.get(
@@ -27,8 +39,45 @@ logs_table_name = os.environ.get(
 locations_table = dynamodb.Table(locations_table_name)
 logs_table = dynamodb.Table(logs_table_name)
 
-print(f"Using locations table: {locations_table_name}")
-print(f"Using logs table: {logs_table_name}")
+logger.debug("Using locations table: %s", locations_table_name)
+logger.debug("Using logs table: %s", logs_table_name)
+
+# Attributes returned by the vehicle log listing; the per-log locations array
+# is never part of the list response, so it is not read from the index
+LOG_SUMMARY_PROJECTION = (
+    "#id, #ts, vehicleId, startTime, endTime, startAddress, endAddress, "
+    "distance, #dur, purpose, notes"
+)
+# id, timestamp and duration are DynamoDB reserved words
+LOG_SUMMARY_ATTRIBUTE_NAMES = {"#id": "id", "#ts": "timestamp", "#dur": "duration"}
+
+# Location attributes a route point carries; fetching only these (plus the
+# key) leaves out whatever else the processor stored on each fix
+ROUTE_POINT_FIELDS = (
+    "lat",
+    "lon",
+    "timestamp",
+    "ele",
+    "cog",
+    "sog",
+    "quality",
+    "satellites_used",
+    "processed_at",
+    "segment_type",
+    "stop_duration_seconds",
+    "address",
+)
+ROUTE_POINT_PROJECTION = "id, " + ", ".join(
+    "#ts" if field == "timestamp" else field for field in ROUTE_POINT_FIELDS
+)
+
+# Number of disjoint sub-ranges queried concurrently for a bounded log listing
+LOG_QUERY_PARTITIONS = 4
+
+# GSI for a vehicle's logs by timestamp, and the key attributes of a
+# LastEvaluatedKey on it (index keys plus the table keys)
+LOG_INDEX_NAME = "VehicleTimestampIndex"
+CURSOR_KEYS = {"id", "vehicleId", "timestamp"}
 
 
 def decimal_default(obj):
@@ -37,6 +86,109 @@ def decimal_default(obj):
     raise TypeError
 
 
+# Shared encoder for log and route bodies; json.dumps with default= would
+# construct a fresh JSONEncoder for each response. Compact separators and raw
+# UTF-8 (addresses) keep the payload small
+response_encoder = json.JSONEncoder(
+    default=decimal_default,
+    check_circular=False,
+    ensure_ascii=False,
+    separators=(",", ":"),
+)
+
+
+def parse_time_param(value):
+    """Convert an epoch or ISO timestamp query parameter to epoch seconds"""
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def encode_cursor(last_evaluated_key):
+    """Turn a DynamoDB LastEvaluatedKey into an opaque pagination cursor"""
+    raw = json.dumps(last_evaluated_key, default=decimal_default)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Turn a pagination cursor back into an ExclusiveStartKey"""
+    raw = base64.urlsafe_b64decode(cursor.encode())
+    start_key = json.loads(raw, parse_float=Decimal)
+    if not isinstance(start_key, dict) or start_key.keys() != CURSOR_KEYS:
+        raise ValueError("malformed cursor")
+    return start_key
+
+
+def build_log_key_condition(vehicle_id, from_time, to_time):
+    """Key condition on the vehicle GSI, narrowed to a time range when given"""
+    condition = Key("vehicleId").eq(vehicle_id)
+    if from_time is not None and to_time is not None:
+        return condition & Key("timestamp").between(from_time, to_time)
+    if from_time is not None:
+        return condition & Key("timestamp").gte(from_time)
+    if to_time is not None:
+        return condition & Key("timestamp").lte(to_time)
+    return condition
+
+
+def log_query_kwargs(vehicle_id, from_time, to_time):
+    """Query arguments for a vehicle's logs on the GSI, newest first"""
+    return {
+        "IndexName": LOG_INDEX_NAME,
+        "KeyConditionExpression": build_log_key_condition(
+            vehicle_id, from_time, to_time
+        ),
+        "ScanIndexForward": False,  # Descending order (newest first)
+        "ProjectionExpression": LOG_SUMMARY_PROJECTION,
+        "ExpressionAttributeNames": LOG_SUMMARY_ATTRIBUTE_NAMES,
+    }
+
+
+def split_time_range(from_time, to_time, parts):
+    """Split an inclusive epoch range into disjoint sub-ranges, newest first"""
+    span = to_time - from_time + 1
+    parts = max(1, min(parts, span))
+    bounds = [from_time + span * k // parts for k in range(parts + 1)]
+    return [(bounds[k], bounds[k + 1] - 1) for k in reversed(range(parts))]
+
+
+def query_logs_in_range(vehicle_id, from_time, to_time):
+    """
+    Fetch every log of a vehicle within an inclusive time range.
+    Runs on worker threads, so it queries through the table's low-level
+    client: boto3 clients are thread-safe, Table resources are not.
+    """
+    client = logs_table.meta.client
+    query_kwargs = log_query_kwargs(vehicle_id, from_time, to_time)
+    query_kwargs["TableName"] = logs_table.name
+    response = client.query(**query_kwargs)
+    items = response.get("Items", [])
+    while "LastEvaluatedKey" in response:
+        query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        response = client.query(**query_kwargs)
+        items.extend(response.get("Items", []))
+    return items
+
+
+def query_logs_in_range_parallel(vehicle_id, from_time, to_time):
+    """
+    Fetch a vehicle's logs within a time range by querying disjoint sub-ranges
+    concurrently, so the pages of a long range are not walked one by one.
+    The sub-ranges are ordered newest first, so concatenating their results
+    keeps the listing sorted by timestamp descending.
+    """
+    ranges = split_time_range(from_time, to_time, LOG_QUERY_PARTITIONS)
+    if len(ranges) == 1:
+        return query_logs_in_range(vehicle_id, from_time, to_time)
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        pages = list(
+            executor.map(lambda r: query_logs_in_range(vehicle_id, *r), ranges)
+        )
+    return [item for page in pages for item in page]
+
+
 def fetch_locations_by_time_range(vehicle_id, start_time, end_time):
     """
     Fetch locations from the locations table within a given time range for a vehicle
@@ -50,66 +202,75 @@ def fetch_locations_by_time_range(vehicle_id, start_time, end_time):
         list: List of location data points
     """
     try:
-        print(
-            f"Fetching locations for vehicle {vehicle_id} from {start_time} to {end_time}"
+        logger.debug(
+            "Fetching locations for vehicle %s from %s to %s",
+            vehicle_id,
+            start_time,
+            end_time,
         )
 
         # Convert ISO format timestamps to epoch if needed
         if isinstance(start_time, str):
             if start_time.isdigit():
                 start_time = int(start_time)
-                print(f"Converted string numeric start_time to int: {start_time}")
+                logger.debug(
+                    "Converted string numeric start_time to int: %s", start_time
+                )
             else:
                 # Parse ISO timestamp to datetime then convert to epoch timestamp
                 try:
                     start_time_dt = datetime.fromisoformat(start_time)
                     start_time = int(start_time_dt.timestamp())
-                    print(f"Converted ISO start_time to epoch: {start_time}")
+                    logger.debug("Converted ISO start_time to epoch: %s", start_time)
                 except Exception as e:
-                    print(f"Error converting start_time: {e}")
+                    logger.warning("Error converting start_time: %s", e)
 
         if isinstance(end_time, str):
             if end_time.isdigit():
                 end_time = int(end_time)
-                print(f"Converted string numeric end_time to int: {end_time}")
+                logger.debug("Converted string numeric end_time to int: %s", end_time)
             else:
                 # Parse ISO timestamp to datetime then convert to epoch timestamp
                 try:
                     end_time_dt = datetime.fromisoformat(end_time)
                     end_time = int(end_time_dt.timestamp())
-                    print(f"Converted ISO end_time to epoch: {end_time}")
+                    logger.debug("Converted ISO end_time to epoch: %s", end_time)
                 except Exception as e:
-                    print(f"Error converting end_time: {e}")
-
-        # Query the locations table with the time range condition
-        response = locations_table.query(
-            KeyConditionExpression=Key("id").eq(vehicle_id)
-            & Key("timestamp").between(start_time, end_time)
-        )
+                    logger.warning("Error converting end_time: %s", e)
+
+        # Query the locations table with the time range condition; the key
+        # condition is built once and reused for every page
+        query_params = {
+            "KeyConditionExpression": Key("id").eq(vehicle_id)
+            & Key("timestamp").between(start_time, end_time),
+            "ProjectionExpression": ROUTE_POINT_PROJECTION,
+            "ExpressionAttributeNames": {"#ts": "timestamp"},
+        }
+        response = locations_table.query(**query_params)
 
         locations = response.get("Items", [])
-        print(f"Found {len(locations)} location points in the time range")
+        logger.debug("Found %d location points in the time range", len(locations))
 
         # Handle pagination if there are more results
         while "LastEvaluatedKey" in response:
             response = locations_table.query(
-                KeyConditionExpression=Key("id").eq(vehicle_id)
-                & Key("timestamp").between(start_time, end_time),
-                ExclusiveStartKey=response["LastEvaluatedKey"],
+                **query_params, ExclusiveStartKey=response["LastEvaluatedKey"]
             )
             locations.extend(response.get("Items", []))
-            print(f"Added {len(response.get('Items', []))} more location points")
+            logger.debug(
+                "Added %d more location points", len(response.get("Items", []))
+            )
 
         return locations
     except Exception as e:
-        print(f"Error fetching locations: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error fetching locations: %s", e)
         return []
 
 
 def handler(event, context):
     # Print event for debugging
-    print("Event received:", json.dumps(event))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Event received: %s", json.dumps(event))
 
     # Common headers for all responses
     headers = {
@@ -128,8 +289,8 @@ def handler(event, context):
         # For REST API or other invocations
         http_method = event.get("httpMethod", "GET").upper()
 
-    print(f"HTTP Method identified: {http_method}")
-    print(f"DynamoDB Table: {logs_table.name}")
+    logger.debug("HTTP Method identified: %s", http_method)
+    logger.debug("DynamoDB Table: %s", logs_table.name)
 
     # Handle OPTIONS requests
     if http_method == "OPTIONS":
@@ -143,10 +304,47 @@ def handler(event, context):
     )  # Default to vehicle_01 if not specified
     include_route = query_parameters.get("route") == "true"
 
+    # Optional time range, page size and cursor for the vehicle's log list
+    try:
+        from_time = parse_time_param(query_parameters.get("from"))
+        to_time = parse_time_param(query_parameters.get("to"))
+        limit = query_parameters.get("limit")
+        limit = int(limit) if limit else None
+        start_key = (
+            decode_cursor(query_parameters["cursor"])
+            if query_parameters.get("cursor")
+            else None
+        )
+    except (TypeError, ValueError) as e:
+        return {
+            "statusCode": 400,
+            "headers": headers,
+            "body": json.dumps({"error": f"Invalid query parameter: {str(e)}"}),
+        }
+    if limit is not None and limit < 1:
+        return {
+            "statusCode": 400,
+            "headers": headers,
+            "body": json.dumps({"error": "limit must be a positive integer"}),
+        }
+    if from_time is not None and to_time is not None and from_time > to_time:
+        return {
+            "statusCode": 400,
+            "headers": headers,
+            "body": json.dumps({"error": "from must not be later than to"}),
+        }
+    if start_key and start_key["vehicleId"] != vehicle_id:
+        return {
+            "statusCode": 400,
+            "headers": headers,
+            "body": json.dumps({"error": "cursor belongs to another vehicle"}),
+        }
+    next_cursor = None
+
     try:
         # If log_id is provided, get that specific log entry
         if log_id:
-            print(f"Fetching log with ID: {log_id}")
+            logger.debug("Fetching log with ID: %s", log_id)
             response = logs_table.query(KeyConditionExpression=Key("id").eq(log_id))
             items = response.get("Items", [])
 
@@ -169,54 +367,93 @@ def handler(event, context):
             elif "locations" in log_entry and not include_route:
                 del log_entry["locations"]
 
-            response_body = json.dumps(log_entry, default=decimal_default)
+            response_body = response_encoder.encode(log_entry)
 
             return {"statusCode": 200, "headers": headers, "body": response_body}
 
         # Try to use GSI first, fall back to scan if GSI is not available
         try:
-            print(f"Querying GSI for vehicle_id: {vehicle_id}")
-            response = logs_table.query(
-                IndexName='VehicleTimestampIndex',
-                KeyConditionExpression=Key('vehicleId').eq(vehicle_id),
-                ScanIndexForward=False  # Descending order (newest first)
-            )
-            
-            items = response.get("Items", [])
-            print(f"Found {len(items)} items for vehicle_id: {vehicle_id}")
-
-            # Handle pagination if there are more results
-            while 'LastEvaluatedKey' in response:
-                print(f"Fetching additional page...")
-                response = logs_table.query(
-                    IndexName='VehicleTimestampIndex',
-                    KeyConditionExpression=Key('vehicleId').eq(vehicle_id),
-                    ScanIndexForward=False,
-                    ExclusiveStartKey=response['LastEvaluatedKey']
+            logger.debug("Querying GSI for vehicle_id: %s", vehicle_id)
+            if (
+                from_time is not None
+                and to_time is not None
+                and limit is None
+                and not start_key
+            ):
+                # A bounded, unpaged listing can be fetched as parallel sub-ranges
+                items = query_logs_in_range_parallel(vehicle_id, from_time, to_time)
+                logger.debug(
+                    "Found %d items for vehicle_id: %s", len(items), vehicle_id
                 )
-                items.extend(response.get("Items", []))
-                print(f"Total items now: {len(items)}")
+            else:
+                query_kwargs = log_query_kwargs(vehicle_id, from_time, to_time)
+                if start_key:
+                    query_kwargs["ExclusiveStartKey"] = start_key
+                if limit:
+                    query_kwargs["Limit"] = limit
+
+                response = logs_table.query(**query_kwargs)
+
+                items = response.get("Items", [])
+                logger.debug(
+                    "Found %d items for vehicle_id: %s", len(items), vehicle_id
+                )
+
+                # Handle pagination until the page limit (if any) is reached
+                while "LastEvaluatedKey" in response and (
+                    limit is None or len(items) < limit
+                ):
+                    logger.debug("Fetching additional page...")
+                    query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+                    if limit:
+                        query_kwargs["Limit"] = limit - len(items)
+                    response = logs_table.query(**query_kwargs)
+                    items.extend(response.get("Items", []))
+                    logger.debug("Total items now: %d", len(items))
+
+                if limit is not None and "LastEvaluatedKey" in response:
+                    next_cursor = encode_cursor(response["LastEvaluatedKey"])
 
             # Items are already sorted by timestamp (descending) due to ScanIndexForward=False
             sorted_items = items
             
         except ClientError as e:
-            # Check if this is a GSI not found error, fall back to scan
-            error_code = e.response.get('Error', {}).get('Code', '')
-            if error_code in ['ValidationException', 'ResourceNotFoundException']:
-                print(f"GSI not available ({error_code}), falling back to scan: {str(e)}")
+            # Check if this is a GSI not found error, fall back to scan; other
+            # validation errors come from the request and must not widen it
+            error = e.response.get("Error", {})
+            error_code = error.get("Code", "")
+            if error_code == "ResourceNotFoundException" or (
+                error_code == "ValidationException"
+                and LOG_INDEX_NAME in error.get("Message", "")
+            ):
+                logger.warning(
+                    "GSI not available (%s), falling back to scan: %s", error_code, e
+                )
                 response = logs_table.scan()
                 items = response.get("Items", [])
-                print(f"Found {len(items)} total items in the table")
+                logger.debug("Found %d total items in the table", len(items))
 
-                # Filter logs for the requested vehicle_id
+                # Filter logs for the requested vehicle_id and time range
                 filtered_items = []
                 for item in items:
                     item_vehicle_id = item.get("vehicleId", "vehicle_01")
-                    if item_vehicle_id == vehicle_id:
-                        filtered_items.append(item)
-
-                print(f"Filtered to {len(filtered_items)} items for vehicle_id: {vehicle_id}")
+                    if item_vehicle_id != vehicle_id:
+                        continue
+                    item_ts = item.get("timestamp")
+                    if from_time is not None or to_time is not None:
+                        if not isinstance(item_ts, (int, float, Decimal)):
+                            continue
+                        if from_time is not None and item_ts < from_time:
+                            continue
+                        if to_time is not None and item_ts > to_time:
+                            continue
+                    filtered_items.append(item)
+
+                logger.debug(
+                    "Filtered to %d items for vehicle_id: %s",
+                    len(filtered_items),
+                    vehicle_id,
+                )
 
                 # Sort by timestamp descending (newest first)
                 def safe_timestamp_key(item):
@@ -226,6 +463,8 @@ def handler(event, context):
                     return ts
 
                 sorted_items = sorted(filtered_items, key=safe_timestamp_key, reverse=True)
+                if limit is not None:
+                    sorted_items = sorted_items[:limit]
             else:
                 # Re-raise other AWS errors (like permission issues, actual DB errors)
                 raise
@@ -241,20 +480,21 @@ def handler(event, context):
         # Process items for response
         logs = []
         for item in sorted_items:
-            # Remove the full locations array to reduce response size
-            processed_item = dict(item)  # Create a copy to avoid modifying the original
-            if "locations" in processed_item:
-                del processed_item["locations"]
-            logs.append(processed_item)
+            # Remove the full locations array to reduce response size; the items
+            # are fresh from DynamoDB and not used elsewhere, so no copy is needed
+            item.pop("locations", None)
+            logs.append(item)
+
+        response_data = {"logs": logs}
+        if next_cursor:
+            response_data["nextCursor"] = next_cursor
 
-        response_body = json.dumps({"logs": logs}, default=decimal_default)
-        print(f"Returning response with {len(logs)} logs")
-        print(f"Response body sample: {response_body[:200]}...")
+        response_body = response_encoder.encode(response_data)
+        logger.debug("Returning response with %d logs", len(logs))
 
         return {"statusCode": 200, "headers": headers, "body": response_body}
     except Exception as e:
-        print(f"Error in handler: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in handler: %s", e)
         return {
             "statusCode": 500,
             "headers": headers,
@@ -273,18 +513,6 @@ def get_route_for_log(log_entry):
     start_address = log_entry.get("startAddress")
     end_address = log_entry.get("endAddress")
 
-    # Fetch locations directly from the locations table
-    locations = fetch_locations_by_time_range(vehicle_id, start_time, end_time)
-
-    if not locations:
-        # Fall back to locations in the log entry if available
-        locations = log_entry.get("locations", [])
-        if not locations:
-            return []
-
-    # Filter and prepare route points
-    route = []
-
     # Sort locations by timestamp (handling both string and numeric timestamps)
     def safe_ts_sort_key(loc):
         ts = loc.get("timestamp", 0)
@@ -294,10 +522,27 @@ def get_route_for_log(log_entry):
             return float(ts)
         return ts
 
-    sorted_locations = sorted(locations, key=safe_ts_sort_key)
+    # Fetch locations directly from the locations table; the query returns
+    # them in sort key (timestamp) order already. A log without a time range
+    # cannot be queried, so it goes straight to its stored locations
+    if start_time and end_time:
+        locations = fetch_locations_by_time_range(vehicle_id, start_time, end_time)
+    else:
+        locations = []
+
+    if not locations:
+        # Fall back to locations in the log entry if available. These were
+        # stored as the client sent them, so they still need sorting
+        locations = log_entry.get("locations", [])
+        if not locations:
+            return []
+        locations = sorted(locations, key=safe_ts_sort_key)
+
+    # Filter and prepare route points
+    route = []
 
     # Extract the route points
-    for loc in sorted_locations:
+    for loc in locations:
         # Include only necessary fields to minimize payload size
         route_point = {
             "lat": loc.get("lat"),
@@ -1,13 +1,17 @@
+from bisect import bisect_left, bisect_right, insort
 from datetime import datetime, timedelta
 from decimal import Decimal
 import json
 import math
 import os
+import re
 import statistics
+import time
 from typing import Any, Dict, List, Tuple
 
 import boto3
 from boto3.dynamodb.conditions import Key
+from botocore.config import Config
 
 # IMPORTANT: DynamoDB timestamp schema
 # The 'timestamp' field is a Number (representing UTC epoch timestamp in seconds)
@@ -20,6 +24,20 @@ def decimal_default(obj):
     raise TypeError
 
 
+# Cleaned sessions can hold thousands of points; encode them with one
+# long-lived encoder rather than building one per json.dumps call
+response_encoder = json.JSONEncoder(default=decimal_default, check_circular=False)
+
+
+# "2025/04/14 02:26:59" and "14.04.2025 02:26:59"; fromisoformat already
+# covers the dashed ISO forms with a "T" or a space
+NON_ISO_TIMESTAMP_PATTERN = re.compile(
+    r"(?:(?P<year>\d{4})/(?P<month>\d{1,2})/(?P<day>\d{1,2})"
+    r"|(?P<dmy_day>\d{1,2})\.(?P<dmy_month>\d{1,2})\.(?P<dmy_year>\d{4}))"
+    r" (?P<h>\d{1,2}):(?P<m>\d{1,2}):(?P<s>\d{1,2})"
+)
+
+
 def parse_timestamp_safely(timestamp):
     """Parse a timestamp value to a datetime object.
 
@@ -50,34 +68,40 @@ def parse_timestamp_safely(timestamp):
             except ValueError:
                 pass
 
-        # Try standard format
-        try:
-            return datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S")
-        except ValueError:
-            pass
-
-        # Try other common formats
-        formats = ["%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M:%S", "%d.%m.%Y %H:%M:%S"]
-
-        for fmt in formats:
+        # Other common formats, matched once instead of trying strptime with
+        # each format in turn
+        match = NON_ISO_TIMESTAMP_PATTERN.fullmatch(timestamp)
+        if match:
+            if match.group("year"):
+                fields = match.group("year", "month", "day")
+            else:
+                fields = match.group("dmy_year", "dmy_month", "dmy_day")
             try:
-                return datetime.strptime(timestamp, fmt)
+                return datetime(
+                    *map(int, fields), *map(int, match.group("h", "m", "s"))
+                )
             except ValueError:
-                continue
+                pass
 
     raise ValueError(f"Unable to parse timestamp: {timestamp}")
 
 
+# Earth diameter in meters (2 * 6371000) and degree-to-radian factors
+_R2 = 12742000.0
+_RAD = math.pi / 180
+_HALF_RAD = math.pi / 360
+
+
 def haversine(lat1, lon1, lat2, lon2):
-    R = 6371000  # Earth radius in meters
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
+    s_phi = math.sin((lat2 - lat1) * _HALF_RAD)
+    s_lambda = math.sin((lon2 - lon1) * _HALF_RAD)
     a = (
-        math.sin(dphi / 2) ** 2
-        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+        s_phi * s_phi
+        + math.cos(lat1 * _RAD) * math.cos(lat2 * _RAD) * s_lambda * s_lambda
     )
-    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    # asin(sqrt(a)) is the single-sqrt form of atan2(sqrt(a), sqrt(1 - a));
+    # a can round just past 1 for antipodal points
+    return _R2 * math.asin(math.sqrt(min(a, 1.0)))
 
 
 def calculate_median_position(locations: List[Dict[str, Any]]) -> Tuple[float, float]:
@@ -94,6 +118,33 @@ def calculate_median_position(locations: List[Dict[str, Any]]) -> Tuple[float, f
     return median_lat, median_lng
 
 
+def forward_window_medians(values: List[float], window: int) -> List[float]:
+    """Median of the next `window` values after each position
+
+    The window slides one step at a time, so it is kept sorted and updated
+    with one removal and one insertion instead of being re-sorted per point.
+    The last position has no values ahead and gets no entry.
+    """
+    n = len(values)
+    ordered = sorted(values[1 : 1 + window])
+    medians = []
+
+    for i in range(n - 1):
+        size = len(ordered)
+        mid = size // 2
+        if size % 2:
+            medians.append(ordered[mid])
+        else:
+            medians.append((ordered[mid - 1] + ordered[mid]) / 2)
+
+        # Slide: drop values[i + 1], take in values[i + 1 + window]
+        del ordered[bisect_left(ordered, values[i + 1])]
+        if i + 1 + window < n:
+            insort(ordered, values[i + 1 + window])
+
+    return medians
+
+
 def clean_phantom_locations(locations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Remove phantom location fixes when vehicle is stopped"""
     # Configuration parameters
@@ -109,141 +160,90 @@ def clean_phantom_locations(locations: List[Dict[str, Any]]) -> List[Dict[str, A
     if len(locations) < 3:
         return locations  # Not enough data points to process
 
-    # Sort by timestamp ascending (now using numeric epoch values)
-    sorted_locations = sorted(locations, key=lambda x: float(x["timestamp"]))
+    # Convert each timestamp to an epoch float once, then sort by timestamp
+    # ascending through those floats; the epochs are kept so stop durations
+    # are plain subtractions
+    unsorted_epochs = [float(loc["timestamp"]) for loc in locations]
+    order = sorted(range(len(locations)), key=unsorted_epochs.__getitem__)
+    sorted_locations = [locations[k] for k in order]
+    epochs = [unsorted_epochs[k] for k in order]
 
     # Calculate median of next n points for each location
-    for i in range(len(sorted_locations)):
-        end_idx = min(i + 1 + MEDIAN_WINDOW_SIZE, len(sorted_locations))
-        if i + 1 < end_idx:  # At least one point ahead
-            future_points = sorted_locations[i + 1 : end_idx]
-
-            # Calculate median position
-            future_lats = [float(loc["lat"]) for loc in future_points]
-            future_lngs = [float(loc["lon"]) for loc in future_points]
-
-            if future_lats and future_lngs:
-                sorted_locations[i]["next_n_median_latitude"] = statistics.median(
-                    future_lats
-                )
-                sorted_locations[i]["next_n_median_longitude"] = statistics.median(
-                    future_lngs
-                )
-
-    # Initialize cleaned data list and processing index
+    lats = [float(loc["lat"]) for loc in sorted_locations]
+    lngs = [float(loc["lon"]) for loc in sorted_locations]
+    median_lats = forward_window_medians(lats, MEDIAN_WINDOW_SIZE)
+    median_lngs = forward_window_medians(lngs, MEDIAN_WINDOW_SIZE)
+
+    # Per-point haversine terms, computed once instead of for every pair
+    # compared: half-angles in radians, so each pair needs only a subtraction
+    # before sin(), and the cosine of each latitude
+    half_phis = [math.radians(lat) / 2 for lat in median_lats]
+    half_lambdas = [math.radians(lng) / 2 for lng in median_lngs]
+    cos_phis = [math.cos(half_phi * 2) for half_phi in half_phis]
+    sin = math.sin
+    # Distance grows with the haversine term a, so runs are cut by comparing
+    # a itself against the threshold's value instead of taking asin/sqrt
+    stop_a_threshold = math.sin(STOP_DISTANCE_THRESHOLD / _R2) ** 2
+
+    # Walk the points once as runs: each run starts at point i and extends
+    # while the following medians stay within the threshold of i's median.
+    # The last point has no median and never joins a run. Items come
+    # straight from the query, so they are annotated in place.
     cleaned_data = []
-    i = 0
     n = len(sorted_locations)
+    with_median = len(half_phis)
+    i = 0
 
     while i < n:
-        current_point = sorted_locations[i]
-
-        # Start checking for a stop from the next point
         j = i + 1
-        stop_candidates = [
-            current_point
-        ]  # Current point is always the start of a potential stop/movement
-
-        # Find consecutive points within the distance threshold of the start point's next median
-        while j < n:
-            next_point = sorted_locations[j]
-
-            # Skip points without median calculations (typically points near the end)
-            if (
-                "next_n_median_latitude" not in current_point
-                or "next_n_median_longitude" not in current_point
-                or "next_n_median_latitude" not in next_point
-                or "next_n_median_longitude" not in next_point
-            ):
-                break
-
-            distance = haversine(
-                current_point["next_n_median_latitude"],
-                current_point["next_n_median_longitude"],
-                next_point["next_n_median_latitude"],
-                next_point["next_n_median_longitude"],
-            )
-
-            if distance < STOP_DISTANCE_THRESHOLD:
-                stop_candidates.append(next_point)
-                j += 1
-            else:
+        while j < with_median:
+            # haversine() between the two medians, from the precomputed terms
+            s_phi = sin(half_phis[j] - half_phis[i])
+            s_lambda = sin(half_lambdas[j] - half_lambdas[i])
+            a = s_phi * s_phi + cos_phis[i] * cos_phis[j] * s_lambda * s_lambda
+            if a >= stop_a_threshold:
                 break  # Movement detected, stop sequence ends
-
-        # Evaluate the identified sequence (stop_candidates)
-        if (
-            len(stop_candidates) > 1
-        ):  # We found at least one subsequent point that was 'stopped'
-            # Safely parse timestamps with error handling
-            try:
-                start_timestamp = stop_candidates[0]["timestamp"]
-                end_timestamp = stop_candidates[-1]["timestamp"]
-
-                # Parse timestamps with fallback for timezone issues
-                start_time = parse_timestamp_safely(start_timestamp)
-                end_time = parse_timestamp_safely(end_timestamp)
-
-                duration = (end_time - start_time).total_seconds()
-            except Exception as e:
-                print(f"Error calculating stop duration: {str(e)}")
-                # Use a default duration if parsing fails
-                duration = 0
-
-            if duration >= MIN_STOP_DURATION_SECONDS:
-                # A significant stop - mark as a charging stop for electric vehicles
-                # Stops up to 50 minutes are still considered part of the same session
-                stop_candidate = stop_candidates[0].copy()
-
-                # Classify the stop type based on duration
-                if duration > MAX_STOP_DURATION_SECONDS:
-                    # Long stop (over 50 minutes) - regular stop
-                    stop_candidate["segment_type"] = "stopped"
-                else:
-                    # Stop within charging time range (1-50 minutes) - mark as charging
-                    stop_candidate["segment_type"] = "charging"
-
-                stop_candidate["stop_duration_seconds"] = duration
-                cleaned_data.append(stop_candidate)
-                # Move the main index past all points in this stop
-                i = j
+            j += 1
+
+        duration = epochs[j - 1] - epochs[i]
+        if j - i > 1 and duration >= MIN_STOP_DURATION_SECONDS:
+            # A significant stop collapses to its first point. Stops up to 50
+            # minutes are still part of the same session (EV charging)
+            stop_point = sorted_locations[i]
+            if duration > MAX_STOP_DURATION_SECONDS:
+                stop_point["segment_type"] = "stopped"
             else:
-                # Very short stop or just noise: Keep all points in the sequence as movement
-                for point in stop_candidates:
-                    point_copy = point.copy()
-                    point_copy["segment_type"] = "moving"
-                    cleaned_data.append(point_copy)
-                # Move the main index past all points in this sequence
-                i = j
+                stop_point["segment_type"] = "charging"
+            stop_point["stop_duration_seconds"] = duration
+            cleaned_data.append(stop_point)
         else:
-            # No stop detected starting at current_point, mark as moving
-            point_copy = current_point.copy()
-            point_copy["segment_type"] = "moving"
-            cleaned_data.append(point_copy)
-            i += 1
-
-    # Remove the temporary median fields before returning
-    for loc in cleaned_data:
-        if "next_n_median_latitude" in loc:
-            del loc["next_n_median_latitude"]
-        if "next_n_median_longitude" in loc:
-            del loc["next_n_median_longitude"]
+            # No stop, or one too short to count: keep every point as movement
+            for k in range(i, j):
+                point = sorted_locations[k]
+                point["segment_type"] = "moving"
+                cleaned_data.append(point)
+
+        # Move the main index past all points in this run
+        i = j
 
     return cleaned_data
 
 
+# Headers are identical for every response, so one dict is shared by all of them
+RESPONSE_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type",
+    "Access-Control-Allow-Methods": "OPTIONS,GET",
+    "Cache-Control": "no-cache, no-store, must-revalidate",
+}
+
+
 def create_api_response(status_code, body, error=False):
     """Create a standardized API Gateway response"""
     return {
         "statusCode": status_code,
-        "headers": {
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "Content-Type",
-            "Access-Control-Allow-Methods": "OPTIONS,GET",
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-        },
-        "body": json.dumps(
-            body if not error else {"error": str(body)}, default=decimal_default
-        ),
+        "headers": RESPONSE_HEADERS,
+        "body": response_encoder.encode(body if not error else {"error": str(body)}),
     }
 
 
@@ -274,6 +274,8 @@ def query_location_range(
             "KeyConditionExpression": Key("id").eq(vehicle_id)
             & Key("timestamp").between(start_time, end_time),
             "ScanIndexForward": True,  # ascending order by timestamp
+            "ProjectionExpression": LOCATION_PROJECTION,
+            "ExpressionAttributeNames": LOCATION_ATTRIBUTE_NAMES,
         }
 
         if exclusive_start_key:
@@ -281,11 +283,15 @@ def query_location_range(
 
         print(f"Query parameters: {query_params}")
 
-        # Execute the query
+        # Execute the query, following pages until the range is exhausted
         response = table.query(**query_params)
+        items = response.get("Items", [])
+        while "LastEvaluatedKey" in response:
+            query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+            response = table.query(**query_params)
+            items.extend(response.get("Items", []))
 
         # Log the results
-        items = response.get("Items", [])
         print(f"Query returned {len(items)} items")
 
         return items, None
@@ -340,95 +346,66 @@ def calculate_time_window(start_timestamp, end_timestamp, time_window_hours):
         return None, None, str(e)
 
 
-def extend_session_points(
-    table, vehicle_id, boundary_timestamp, direction="backward", extension_minutes=50
-):
+def session_extension_length(epochs, boundary, direction, now=None):
     """
-    Extend session points in either direction
+    Number of already-fetched points a session extends by past its boundary
+
+    Replays the extension steps in memory: each step moves the boundary to
+    the farthest point within SESSION_EXTENSION_MINUTES of it, and the walk
+    ends when a step finds nothing new or after MAX_SESSION_EXTENSIONS steps.
+    Forward walks also end once the boundary is within five minutes of `now`.
 
     Args:
-        table: DynamoDB table object
-        vehicle_id: Vehicle identifier
-        boundary_timestamp: The current boundary timestamp (epoch or string)
+        epochs: Ascending epoch seconds of the points beyond the boundary
+        boundary: Epoch seconds of the session's current first/last point
         direction: "backward" or "forward"
-        extension_minutes: Minutes to extend
+        now: Current epoch seconds, for forward walks
 
     Returns:
-        tuple: (new_points, new_boundary_timestamp, error)
+        int: For "backward", how many points at the end of `epochs` belong to
+        the session; for "forward", how many at the start
     """
-    try:
-        boundary_time = parse_timestamp_safely(boundary_timestamp)
-
-        if direction == "backward":
-            # Calculate time before boundary
-            extended_time = boundary_time - timedelta(minutes=extension_minutes)
-            extended_timestamp = int(extended_time.timestamp())  # Convert to epoch
-            start_timestamp = extended_timestamp
-            end_timestamp = (
-                int(boundary_time.timestamp())
-                if isinstance(boundary_timestamp, datetime)
-                else boundary_timestamp
-            )
-        else:  # forward
-            # Calculate time after boundary
-            extended_time = boundary_time + timedelta(minutes=extension_minutes)
-            extended_timestamp = int(extended_time.timestamp())  # Convert to epoch
-            start_timestamp = (
-                int(boundary_time.timestamp())
-                if isinstance(boundary_timestamp, datetime)
-                else boundary_timestamp
-            )
-            end_timestamp = extended_timestamp
-
-            # Check if we're already close to current time
-            current_time = datetime.now()
-            if (
-                current_time - boundary_time
-            ).total_seconds() < 300:  # 5 minutes threshold
-                print(
-                    f"Boundary timestamp is already close to current time - stopping extensions"
-                )
-                return [], boundary_timestamp, "Close to current time"
-
-        print(
-            f"Looking for additional session points from: {start_timestamp} to {end_timestamp}"
-        )
-
-        # Query for extended points
-        query_expression = Key("id").eq(vehicle_id) & Key("timestamp").between(
-            start_timestamp, end_timestamp
-        )
-
-        # Exclude boundary point for forward queries after first extension to avoid duplicates
-        exclusive_start_key = None
+    step = SESSION_EXTENSION_MINUTES * 60
 
-        response = table.query(
-            KeyConditionExpression=query_expression,
-            ScanIndexForward=True,
-            ExclusiveStartKey=exclusive_start_key,
-        )
-
-        # Get points from response
-        extended_points = response.get("Items", [])
-
-        if extended_points:
-            # Update boundary timestamp
-            new_boundary = (
-                extended_points[0]["timestamp"]
-                if direction == "backward"
-                else extended_points[-1]["timestamp"]
-            )
-            return extended_points, new_boundary, None
-        else:
-            return [], boundary_timestamp, "No points found"
-
-    except Exception as e:
-        print(f"Error extending session points: {str(e)}")
-        return [], boundary_timestamp, str(e)
-
-
-# Database setup
-dynamodb = boto3.resource("dynamodb")
+    if direction == "backward":
+        index = len(epochs)
+        for _ in range(MAX_SESSION_EXTENSIONS):
+            reached = bisect_left(epochs, boundary - step)
+            if reached >= index:
+                break
+            index = reached
+            boundary = epochs[index]
+        return len(epochs) - index
+
+    index = 0
+    for _ in range(MAX_SESSION_EXTENSIONS):
+        if now is not None and now - boundary < 300:
+            break
+        reached = bisect_right(epochs, boundary + step)
+        if reached <= index:
+            break
+        index = reached
+        boundary = epochs[index - 1]
+    return index
+
+
+# Location attributes the history response carries (see HistoryApiItem in the
+# frontend); anything else the processor stored on a fix is left in the table
+LOCATION_PROJECTION = "#id, #ts, lat, lon, segment_type, stop_duration_seconds, address"
+LOCATION_ATTRIBUTE_NAMES = {"#id": "id", "#ts": "timestamp"}
+
+# Sessions are followed past the requested range in steps of this many
+# minutes, up to this many steps in each direction
+SESSION_EXTENSION_MINUTES = 50
+MAX_SESSION_EXTENSIONS = 15
+
+# Database setup; a request issues several queries (the range plus one per
+# extension side), so keep the connection alive across them and across warm
+# invocations
+DYNAMODB_CONFIG = Config(
+    tcp_keepalive=True, retries={"mode": "adaptive", "max_attempts": 3}
+)
+dynamodb = boto3.resource("dynamodb", config=DYNAMODB_CONFIG)
 
 # Get table names from environment variables or use defaults (matching actual names in AWS)
 locations_table_name = os.environ.get(
@@ -504,52 +481,56 @@ def handler(event, context):
 
         print(f"Initial query returned {len(items)} points")
 
-        # Extend session backwards
+        # Extend the session in both directions. Everything the extension
+        # steps could reach is fetched with one query per side, and the steps
+        # are then replayed over those points instead of one query per step
         earliest_timestamp = items[0]["timestamp"]
         latest_timestamp = items[-1]["timestamp"]
+        reach = MAX_SESSION_EXTENSIONS * SESSION_EXTENSION_MINUTES * 60
 
-        # Backward extension loop
-        extension_count = 0
-        while extension_count < 15:  # Max 15 extensions
-            earlier_points, new_earliest, error = extend_session_points(
-                locations_table, vehicle_id, earliest_timestamp, "backward"
-            )
-
-            if error == "No points found" or error:
-                break
-
-            if earlier_points:
-                print(
-                    f"Found {len(earlier_points)} earlier points in extension #{extension_count+1}"
-                )
-                items = earlier_points + items
-                earliest_timestamp = new_earliest
-                extension_count += 1
-            else:
-                break
-
-        # Forward extension loop
-        future_extension_count = 0
-        while future_extension_count < 15:  # Max 15 extensions
-            later_points, new_latest, error = extend_session_points(
-                locations_table, vehicle_id, latest_timestamp, "forward"
-            )
+        earlier_points, error = query_location_range(
+            locations_table,
+            vehicle_id,
+            earliest_timestamp - reach,
+            earliest_timestamp,
+        )
+        if error:
+            print(f"Could not extend session backwards: {error}")
+        earlier_points = [
+            p for p in earlier_points if p["timestamp"] < earliest_timestamp
+        ]
+        extension_count = session_extension_length(
+            [float(p["timestamp"]) for p in earlier_points],
+            float(earliest_timestamp),
+            "backward",
+        )
 
-            if error == "No points found" or error == "Close to current time" or error:
-                break
+        later_points, error = query_location_range(
+            locations_table,
+            vehicle_id,
+            latest_timestamp,
+            latest_timestamp + reach,
+        )
+        if error:
+            print(f"Could not extend session forwards: {error}")
+        later_points = [p for p in later_points if p["timestamp"] > latest_timestamp]
+        future_extension_count = session_extension_length(
+            [float(p["timestamp"]) for p in later_points],
+            float(latest_timestamp),
+            "forward",
+            now=time.time(),
+        )
 
-            if later_points:
-                print(
-                    f"Found {len(later_points)} later points in extension #{future_extension_count+1}"
-                )
-                items = items + later_points
-                latest_timestamp = new_latest
-                future_extension_count += 1
-            else:
-                break
+        # Assemble the session in a single list, already in timestamp order:
+        # the reached earlier points, the requested range, the reached later ones
+        session_points = earlier_points[len(earlier_points) - extension_count :]
+        session_points.extend(items)
+        session_points.extend(later_points[:future_extension_count])
+        items = session_points
 
         print(
-            f"Final dataset has {len(items)} points after {extension_count} backward and {future_extension_count} forward extensions"
+            f"Final dataset has {len(items)} points after adding "
+            f"{extension_count} earlier and {future_extension_count} later points"
         )
 
         # Clean phantom locations
@@ -24,6 +24,9 @@ locations_table_name = os.environ.get(
 table = dynamodb.Table(locations_table_name)
 print(f"Using locations table: {locations_table_name}")
 
+# Only the location attributes the frontend reads are fetched
+LOCATION_PROJECTION = "#id, #ts, lat, lon, segment_type, stop_duration_seconds, address"
+
 
 def decimal_default(obj):
     if isinstance(obj, Decimal):
@@ -44,6 +47,8 @@ def handler(event, context):
             KeyConditionExpression=Key("id").eq(vehicle_id),
             ScanIndexForward=False,  # descending order
             Limit=1,
+            ProjectionExpression=LOCATION_PROJECTION,
+            ExpressionAttributeNames={"#id": "id", "#ts": "timestamp"},
         )
 
         # Add a human-readable timestamp for easier frontend display
@@ -27,6 +27,9 @@ locations_table_name = os.environ.get(
 table = dynamodb.Table(locations_table_name)
 print(f"Using locations table: {locations_table_name}")
 
+# Only the location attributes the frontend reads are fetched
+LOCATION_PROJECTION = "#id, #ts, lat, lon, segment_type, stop_duration_seconds, address"
+
 
 def handler(event, context):
     try:
@@ -34,11 +37,13 @@ def handler(event, context):
             KeyConditionExpression=Key("id").eq("vehicle_01"),
             ScanIndexForward=False,  # newest first
             Limit=50,
+            ProjectionExpression=LOCATION_PROJECTION,
+            ExpressionAttributeNames={"#id": "id", "#ts": "timestamp"},
         )
 
+        # DynamoDB returns the page newest first; flip it to oldest first
         items = response.get("Items", [])
-        # Sort by timestamp which is now a number
-        items_sorted = sorted(items, key=lambda x: x["timestamp"])
+        items.reverse()
 
         return {
             "statusCode": 200,
@@ -47,7 +52,7 @@ def handler(event, context):
                 "Access-Control-Allow-Headers": "Content-Type",
                 "Access-Control-Allow-Methods": "OPTIONS,GET",
             },
-            "body": json.dumps(items_sorted, default=decimal_default),
+            "body": json.dumps(items, default=decimal_default),
         }
 
     except Exception as e:
@@ -17,16 +17,20 @@ def decimal_default(obj):
     raise TypeError
 
 
+# Every response carries the same CORS and caching headers; built once per container
+RESPONSE_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type",
+    "Access-Control-Allow-Methods": "OPTIONS,GET",
+    "Cache-Control": "no-cache, no-store, must-revalidate",
+}
+
+
 def create_api_response(status_code, body, error=False):
     """Create a standardized API Gateway response"""
     return {
         "statusCode": status_code,
-        "headers": {
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "Content-Type",
-            "Access-Control-Allow-Methods": "OPTIONS,GET",
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-        },
+        "headers": RESPONSE_HEADERS,
         "body": json.dumps(
             body if not error else {"error": str(body)}, default=decimal_default
         ),
@@ -70,14 +74,15 @@ def handler(event, context):
         items = []
         exclusive_start_key = None
 
+        # The key condition is the same for every page, so build it once
+        query_params = {
+            "KeyConditionExpression": Key("id").eq(vehicle_id)
+            & Key("timestamp").between(start_timestamp, end_timestamp),
+            "ScanIndexForward": False,  # Newest first for better user experience
+        }
+
         # Paginate through results since we might have a lot of data
         while True:
-            query_params = {
-                "KeyConditionExpression": Key("id").eq(vehicle_id)
-                & Key("timestamp").between(start_timestamp, end_timestamp),
-                "ScanIndexForward": False,  # Newest first for better user experience
-            }
-
             if exclusive_start_key:
                 query_params["ExclusiveStartKey"] = exclusive_start_key
 
@@ -10,6 +10,12 @@ from typing import Any, Dict, List
 # Global state for location history tracking
 location_history: List[Dict[str, Any]] = []
 
+# Meters per degree of latitude on the sphere used by haversine_distance
+METERS_PER_DEGREE = 6371000 * math.pi / 180
+# Flat-earth estimates below this share of the movement threshold are rejected
+# without running the exact haversine
+FLAT_EARTH_REJECT_RATIO = 0.99
+
 
 def reset_location_history():
     """Reset the location history."""
@@ -48,11 +54,14 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     # Haversine formula
     dlon = lon2_rad - lon1_rad
     dlat = lat2_rad - lat1_rad
+    sin_dlat = math.sin(dlat * 0.5)
+    sin_dlon = math.sin(dlon * 0.5)
     a = (
-        math.sin(dlat / 2) ** 2
-        + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
+        sin_dlat * sin_dlat
+        + math.cos(lat1_rad) * math.cos(lat2_rad) * sin_dlon * sin_dlon
     )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    # 2*asin(sqrt(a)) == 2*atan2(sqrt(a), sqrt(1-a)); clamp guards rounding above 1
+    c = 2 * math.asin(math.sqrt(min(a, 1.0)))
     distance = R * c
 
     return distance
@@ -180,6 +189,18 @@ def is_significant_movement(
     if not previous_loc:
         return True
 
+    # Most fixes barely move, so try a cheap equirectangular estimate first.
+    # At threshold scale it is far closer to the haversine than the margin.
+    dlat_m = (new_loc["lat"] - previous_loc["lat"]) * METERS_PER_DEGREE
+    dlon_m = (
+        (new_loc["lon"] - previous_loc["lon"])
+        * METERS_PER_DEGREE
+        * math.cos(math.radians((new_loc["lat"] + previous_loc["lat"]) * 0.5))
+    )
+    reject_below = min_distance * FLAT_EARTH_REJECT_RATIO
+    if dlat_m * dlat_m + dlon_m * dlon_m < reject_below * reject_below:
+        return False
+
     distance = haversine_distance(
         previous_loc["lat"], previous_loc["lon"], new_loc["lat"], new_loc["lon"]
     )
@@ -211,10 +232,13 @@ def to_decimal_safe(value):
     Returns:
         Float value or None if conversion fails
     """
+    # Numbers decoded from JSON are the common case
+    if isinstance(value, float):
+        return value
     if value is None or value == "":
         return None
     try:
-        return float(str(value))
+        return float(value)
     except (ValueError, TypeError):
         return None
 
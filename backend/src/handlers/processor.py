@@ -22,6 +22,12 @@ print(f"Using locations table: {locations_table_name}")
 # Global state for location history tracking
 location_history: List[Dict[str, Any]] = []
 
+# Meters per degree of latitude on the sphere used by haversine_distance
+METERS_PER_DEGREE = 6371000 * math.pi / 180
+# Flat-earth estimates below this share of the movement threshold are rejected
+# without running the exact haversine
+FLAT_EARTH_REJECT_RATIO = 0.99
+
 
 def parse_timestamp(time_str: str) -> datetime.datetime:
     """Parse ISO timestamp to datetime object."""
@@ -182,6 +188,18 @@ def is_significant_movement(
     if not previous_loc:
         return True
 
+    # Most fixes barely move, so try a cheap equirectangular estimate first.
+    # At threshold scale it is far closer to the haversine than the margin.
+    dlat_m = (new_loc["lat"] - previous_loc["lat"]) * METERS_PER_DEGREE
+    dlon_m = (
+        (new_loc["lon"] - previous_loc["lon"])
+        * METERS_PER_DEGREE
+        * math.cos(math.radians((new_loc["lat"] + previous_loc["lat"]) * 0.5))
+    )
+    reject_below = min_distance * FLAT_EARTH_REJECT_RATIO
+    if dlat_m * dlat_m + dlon_m * dlon_m < reject_below * reject_below:
+        return False
+
     distance = haversine_distance(
         previous_loc["lat"], previous_loc["lon"], new_loc["lat"], new_loc["lon"]
     )
@@ -302,6 +320,8 @@ def process_location(event, context):
                 "body": json.dumps(
                     {
                         "status": f"Processed {len(event)} locations, {success_count} successful",
+                        "total": len(event),
+                        "successful": success_count,
                         "details": results,
                     }
                 ),
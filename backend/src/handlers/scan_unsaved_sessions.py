@@ -1,9 +1,9 @@
+from bisect import bisect_left, insort
 from datetime import UTC, datetime, timedelta
 from decimal import Decimal
 import json
 import math
 import os
-import statistics
 import traceback
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -45,16 +45,47 @@ def decimal_default(obj):
     raise TypeError
 
 
+# Earth diameter in meters and degree-to-radian factors for haversine()
+_R2 = 12742000.0
+_RAD = math.pi / 180
+_HALF_RAD = math.pi / 360
+
+
 def haversine(lat1, lon1, lat2, lon2):
-    R = 6371000  # Earth radius in meters
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
+    s_phi = math.sin((lat2 - lat1) * _HALF_RAD)
+    s_lambda = math.sin((lon2 - lon1) * _HALF_RAD)
     a = (
-        math.sin(dphi / 2) ** 2
-        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+        s_phi * s_phi
+        + math.cos(lat1 * _RAD) * math.cos(lat2 * _RAD) * s_lambda * s_lambda
     )
-    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    # Equal to 2 * atan2(sqrt(a), sqrt(1 - a)) with one sqrt; clamp rounding
+    # past 1 for antipodal points
+    return _R2 * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def forward_window_medians(values: List[float], window: int) -> List[float]:
+    """Median of up to `window` values following each position but the last
+
+    A sorted copy of the window is carried along: each step removes the value
+    that falls out and inserts the one that comes in, both by bisection.
+    """
+    n = len(values)
+    ordered = sorted(values[1 : 1 + window])
+    medians = []
+
+    for i in range(n - 1):
+        size = len(ordered)
+        mid = size // 2
+        if size % 2:
+            medians.append(ordered[mid])
+        else:
+            medians.append((ordered[mid - 1] + ordered[mid]) / 2)
+
+        del ordered[bisect_left(ordered, values[i + 1])]
+        if i + 1 + window < n:
+            insort(ordered, values[i + 1 + window])
+
+    return medians
 
 
 def clean_phantom_locations(locations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -74,28 +105,18 @@ def clean_phantom_locations(locations: List[Dict[str, Any]]) -> List[Dict[str, A
     # Sort by timestamp ascending
     sorted_locations = sorted(locations, key=lambda x: x["timestamp"])
 
-    # Calculate median of next n points for each location
-    for i in range(len(sorted_locations)):
-        end_idx = min(i + 1 + MEDIAN_WINDOW_SIZE, len(sorted_locations))
-        if i + 1 < end_idx:  # At least one point ahead
-            future_points = sorted_locations[i + 1 : end_idx]
-
-            # Calculate median position
-            future_lats = [float(loc["lat"]) for loc in future_points]
-            future_lngs = [float(loc["lon"]) for loc in future_points]
-
-            if future_lats and future_lngs:
-                sorted_locations[i]["next_n_median_latitude"] = statistics.median(
-                    future_lats
-                )
-                sorted_locations[i]["next_n_median_longitude"] = statistics.median(
-                    future_lngs
-                )
+    # Calculate median of next n points for each location. The medians are
+    # kept in lists indexed like sorted_locations; the last point has nothing
+    # ahead of it and gets no median
+    n = len(sorted_locations)
+    lats = [float(loc["lat"]) for loc in sorted_locations]
+    lngs = [float(loc["lon"]) for loc in sorted_locations]
+    median_lats = forward_window_medians(lats, MEDIAN_WINDOW_SIZE)
+    median_lngs = forward_window_medians(lngs, MEDIAN_WINDOW_SIZE)
 
     # Initialize cleaned data list and processing index
     cleaned_data = []
     i = 0
-    n = len(sorted_locations)
 
     while i < n:
         current_point = sorted_locations[i]
@@ -106,28 +127,15 @@ def clean_phantom_locations(locations: List[Dict[str, Any]]) -> List[Dict[str, A
             current_point
         ]  # Current point is always the start of a potential stop/movement
 
-        # Find consecutive points within the distance threshold of the start point's next median
-        while j < n:
-            next_point = sorted_locations[j]
-
-            # Skip points without median calculations (typically points near the end)
-            if (
-                "next_n_median_latitude" not in current_point
-                or "next_n_median_longitude" not in current_point
-                or "next_n_median_latitude" not in next_point
-                or "next_n_median_longitude" not in next_point
-            ):
-                break
-
+        # Find consecutive points within the distance threshold of the start
+        # point's next median, stopping at the last point (it has no median)
+        while j < n - 1:
             distance = haversine(
-                current_point["next_n_median_latitude"],
-                current_point["next_n_median_longitude"],
-                next_point["next_n_median_latitude"],
-                next_point["next_n_median_longitude"],
+                median_lats[i], median_lngs[i], median_lats[j], median_lngs[j]
             )
 
             if distance < STOP_DISTANCE_THRESHOLD:
-                stop_candidates.append(next_point)
+                stop_candidates.append(sorted_locations[j])
                 j += 1
             else:
                 break  # Movement detected, stop sequence ends
@@ -163,13 +171,6 @@ def clean_phantom_locations(locations: List[Dict[str, Any]]) -> List[Dict[str, A
             cleaned_data.append(point_copy)
             i += 1
 
-    # Remove the temporary median fields before returning
-    for loc in cleaned_data:
-        if "next_n_median_latitude" in loc:
-            del loc["next_n_median_latitude"]
-        if "next_n_median_longitude" in loc:
-            del loc["next_n_median_longitude"]
-
     return cleaned_data
 
 
@@ -18,6 +18,27 @@ import gps_processing
 # Input and output file paths
 INPUT_FILE = "/Users/ralf.sigmund/GitHub/mp_m5_fahrtenbuch/gps_logs/gps_logs/2025-04-22_locations.jsonl"
 OUTPUT_FILE = "processor_test_results.jsonl"
+READ_CHUNK_SIZE = 8 << 20  # 8 MiB blocks for JSONL reads
+WRITE_BUFFER_SIZE = 1 << 20  # 1 MiB output buffer
+
+def iter_jsonl_lines(path, chunk_size=READ_CHUNK_SIZE):
+    """Yield raw JSONL lines (bytes) from a file read in large blocks."""
+    with open(path, 'rb') as f:
+        tail = b''
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            lines = (tail + chunk).split(b'\n')
+            tail = lines.pop()
+            yield from lines
+        if tail:
+            yield tail
+
+def write_result(output_file, result):
+    """Append a result record to the buffered JSONL output."""
+    output_file.write(json.dumps(result))
+    output_file.write('\n')
 
 def process_single_location_offline(location_data, output_file, processor):
     """Process a single location data point (offline version without DynamoDB)."""
@@ -46,7 +67,7 @@ def process_single_location_offline(location_data, output_file, processor):
             else:
                 result["processing_result"] = "no_significant_movement"
 
-        output_file.write(json.dumps(result) + '\n')
+        write_result(output_file, result)
         return result
 
     except Exception as e:
@@ -58,7 +79,7 @@ def process_single_location_offline(location_data, output_file, processor):
             "reason": f"Processing error: {str(e)}",
             "distance_from_last": None
         }
-        output_file.write(json.dumps(result) + '\n')
+        write_result(output_file, result)
         return result
 
 def main():
@@ -99,13 +120,13 @@ def main():
     }
     
     try:
-        with open(INPUT_FILE, 'r') as input_file, open(OUTPUT_FILE, 'w') as output_file:
+        with open(OUTPUT_FILE, 'w', buffering=WRITE_BUFFER_SIZE) as output_file:
             print("Starting processing...")
             
-            for line_num, line in enumerate(input_file, 1):
+            for line_num, line in enumerate(iter_jsonl_lines(INPUT_FILE), 1):
                 try:
-                    # Parse JSON line
-                    location_data = json.loads(line.strip())
+                    # Parse JSON line (json.loads tolerates the trailing "\r" of CRLF files)
+                    location_data = json.loads(line)
                     
                     # Process the location
                     result = process_single_location_offline(location_data, output_file, processor)
@@ -82,10 +82,10 @@ class TestGetLatestLocationErrorHandling:
 class TestGeocodeServiceErrorHandling:
     """Test error handling for geocode_service handler"""
 
-    @patch("handlers.geocode_service.requests.get")
-    def test_geocode_service_api_timeout(self, mock_get):
+    @patch("handlers.geocode_service.get_nominatim_session")
+    def test_geocode_service_api_timeout(self, mock_session):
         """Test API timeout handling"""
-        mock_get.side_effect = Exception("Request timeout")
+        mock_session.return_value.get.side_effect = Exception("Request timeout")
 
         event = {"body": json.dumps({"lat": 52.5200, "lon": 13.4050})}
 
@@ -97,12 +97,12 @@ class TestGeocodeServiceErrorHandling:
         # May have error field or fallback address
         assert "error" in body or "address" in body
 
-    @patch("handlers.geocode_service.requests.get")
-    def test_geocode_service_invalid_response(self, mock_get):
+    @patch("handlers.geocode_service.get_nominatim_session")
+    def test_geocode_service_invalid_response(self, mock_session):
         """Test invalid API response handling"""
         mock_response = MagicMock()
         mock_response.json.side_effect = json.JSONDecodeError("Invalid JSON", "", 0)
-        mock_get.return_value = mock_response
+        mock_session.return_value.get.return_value = mock_response
 
         event = {"body": json.dumps({"lat": 52.5200, "lon": 13.4050})}
 
@@ -2,23 +2,313 @@ from decimal import Decimal
 import json
 import os
 import sys
+import time
 from unittest.mock import MagicMock, patch
 
+import boto3
+from moto import mock_aws
 import pytest
 
 # Add the src directory to the path so we can import handlers
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
+import handlers.geocode_service as geocode_service
 from handlers.geocode_service import handler, reverse_geocode
 
 # Mark all tests in this file as unit tests
 pytestmark = pytest.mark.unit
 
 
+@pytest.fixture
+def geocode_cache():
+    """Moto geocode cache table wired into the module's lazy clients"""
+    with mock_aws():
+        dynamodb = boto3.resource("dynamodb", region_name="eu-central-1")
+        table = dynamodb.create_table(
+            TableName=geocode_service.GEOCODE_CACHE_TABLE,
+            KeySchema=[{"AttributeName": "cache_key", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "cache_key", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        geocode_service.local_cache.clear()
+        with patch.object(geocode_service, "dynamodb", dynamodb), patch.object(
+            geocode_service, "geocode_cache_table", table
+        ):
+            yield table
+        geocode_service.local_cache.clear()
+
+
+def cache_entry(cache_key, address, expires_in=3600):
+    """A cache table item expiring expires_in seconds from now"""
+    return {
+        "cache_key": cache_key,
+        "address": address,
+        "operation": "reverse",
+        "expires_at": int(time.time()) + expires_in,
+    }
+
+
 class TestReverseGeocode:
     pass
 
 
+class TestSaveAddressToCache:
+
+    def stored_address(self, table, cache_key):
+        return table.get_item(Key={"cache_key": cache_key})["Item"]["address"]
+
+    def test_new_entry_is_written(self, geocode_cache):
+        """Test a lookup result is stored with its expiry and floats as Decimal"""
+        geocode_service.save_address_to_cache(
+            "rev_a", {"address": "New Address", "lat": 52.52, "raw_response": {}}
+        )
+
+        item = geocode_cache.get_item(Key={"cache_key": "rev_a"})["Item"]
+        assert item["address"] == "New Address"
+        assert item["lat"] == Decimal("52.52")
+        assert "raw_response" not in item
+        assert item["expires_at"] > time.time()
+
+    def test_live_entry_is_not_overwritten(self, geocode_cache, capsys):
+        """Test a concurrent lookup's live entry is kept, without an error"""
+        geocode_cache.put_item(Item=cache_entry("rev_a", "First Writer"))
+
+        geocode_service.save_address_to_cache("rev_a", {"address": "Second Writer"})
+
+        assert self.stored_address(geocode_cache, "rev_a") == "First Writer"
+        assert "Cache save error" not in capsys.readouterr().out
+
+    def test_expired_entry_is_overwritten(self, geocode_cache):
+        """Test an entry past its expiry, not yet removed by TTL, is replaced"""
+        geocode_cache.put_item(Item=cache_entry("rev_a", "Stale Address", -60))
+
+        geocode_service.save_address_to_cache("rev_a", {"address": "Fresh Address"})
+
+        assert self.stored_address(geocode_cache, "rev_a") == "Fresh Address"
+
+
+class TestLocalCache:
+
+    NOW = 1_700_000_000
+
+    def setup_method(self):
+        geocode_service.local_cache.clear()
+
+    def teardown_method(self):
+        geocode_service.local_cache.clear()
+
+    def entry(self, address, expires_in=3600):
+        return {"address": address, "expires_at": self.NOW + expires_in}
+
+    @patch("handlers.geocode_service.time")
+    def test_least_recently_used_entry_is_evicted(self, mock_time):
+        """Test a full cache drops the entry read or written longest ago"""
+        mock_time.monotonic.return_value = 100.0
+        mock_time.time.return_value = self.NOW
+
+        with patch.object(geocode_service, "LOCAL_CACHE_SIZE", 2):
+            geocode_service.local_cache_put("a", self.entry("A"))
+            geocode_service.local_cache_put("b", self.entry("B"))
+            assert geocode_service.local_cache_get("a")["address"] == "A"
+            geocode_service.local_cache_put("c", self.entry("C"))
+
+        assert list(geocode_service.local_cache) == ["a", "c"]
+        assert geocode_service.local_cache_get("b") is None
+
+    @patch("handlers.geocode_service.time")
+    def test_entry_lifetime(self, mock_time):
+        """Test entries are served for LOCAL_CACHE_SECONDS, then dropped"""
+        mock_time.time.return_value = self.NOW
+        mock_time.monotonic.return_value = 100.0
+        geocode_service.local_cache_put("a", self.entry("A"))
+
+        mock_time.monotonic.return_value = 100.0 + geocode_service.LOCAL_CACHE_SECONDS
+        assert geocode_service.local_cache_get("a")["address"] == "A"
+
+        mock_time.monotonic.return_value = 101.0 + geocode_service.LOCAL_CACHE_SECONDS
+        assert geocode_service.local_cache_get("a") is None
+        assert "a" not in geocode_service.local_cache
+
+    @patch("handlers.geocode_service.time")
+    def test_expired_table_entry_is_dropped(self, mock_time):
+        """Test an entry past its expires_at is not served from memory"""
+        mock_time.monotonic.return_value = 100.0
+        mock_time.time.return_value = self.NOW
+        geocode_service.local_cache_put("a", self.entry("A", expires_in=30))
+        assert geocode_service.local_cache_get("a")["address"] == "A"
+
+        mock_time.time.return_value = self.NOW + 30
+        assert geocode_service.local_cache_get("a") is None
+        assert "a" not in geocode_service.local_cache
+
+
+class TestSearchCacheKey:
+
+    @pytest.mark.parametrize(
+        "spellings",
+        [
+            ["Hauptstr. 5", "hauptstrasse 5", "Hauptstraße 5", "HAUPTSTR 5"],
+            ["Str. des 17. Juni", "Strasse des 17 Juni", "Straße des 17. Juni"],
+            ["Main St., Springfield", "main street springfield"],
+            ["Große Allee 3", "grosse  allee 3"],
+        ],
+    )
+    def test_spellings_share_a_key(self, spellings):
+        """Test case, punctuation, spacing, ß and abbreviations collapse to one key"""
+        keys = {geocode_service.search_cache_key(query) for query in spellings}
+        assert len(keys) == 1
+        assert keys.pop().startswith("search_")
+
+    def test_different_addresses_have_different_keys(self):
+        """Test canonicalization keeps distinct addresses apart"""
+        queries = [
+            "Hauptstrasse 5",
+            "Hauptstrasse 7",
+            "Nebenstrasse 5",
+            "Hauptstrasse 5 Berlin",
+            "Hauptplatz 5",
+        ]
+        keys = {geocode_service.search_cache_key(query) for query in queries}
+        assert len(keys) == len(queries)
+
+
+class TestThrottle:
+
+    NOW = 1_700_000_000.0
+    NOW_MS = int(NOW * 1000)
+
+    def next_slot(self, table):
+        item = table.get_item(Key={"cache_key": geocode_service.THROTTLE_CACHE_KEY})
+        return int(item["Item"]["next_slot"])
+
+    @patch("handlers.geocode_service.time")
+    def test_idle_limiter_claims_current_slot(self, mock_time, geocode_cache):
+        """Test a free limiter hands out the current time and books the next slot"""
+        mock_time.time.return_value = self.NOW
+
+        geocode_service.throttle_requests()
+
+        assert self.next_slot(geocode_cache) == (
+            self.NOW_MS + geocode_service.RATE_LIMIT_DELAY_MS
+        )
+        mock_time.sleep.assert_not_called()
+
+    @patch("handlers.geocode_service.time")
+    def test_busy_limiter_queues_behind_next_slot(self, mock_time, geocode_cache):
+        """Test a reserved slot in the future is waited for and pushed out"""
+        booked = self.NOW_MS + 400
+        geocode_cache.put_item(
+            Item={"cache_key": geocode_service.THROTTLE_CACHE_KEY, "next_slot": booked}
+        )
+        mock_time.time.return_value = self.NOW
+
+        assert geocode_service.reserve_request_slot() == booked
+        assert self.next_slot(geocode_cache) == (
+            booked + geocode_service.RATE_LIMIT_DELAY_MS
+        )
+
+        geocode_service.throttle_requests()
+
+        # The second caller waits for the slot after the first one
+        mock_time.sleep.assert_called_once()
+        wait = mock_time.sleep.call_args.args[0]
+        assert wait == pytest.approx(0.4 + geocode_service.RATE_LIMIT_DELAY)
+
+    @patch("handlers.geocode_service.time")
+    def test_full_queue_raises(self, mock_time, geocode_cache):
+        """Test callers are turned away once the queue reaches the cap"""
+        booked = self.NOW_MS + geocode_service.MAX_THROTTLE_QUEUE_MS
+        geocode_cache.put_item(
+            Item={"cache_key": geocode_service.THROTTLE_CACHE_KEY, "next_slot": booked}
+        )
+        mock_time.time.return_value = self.NOW
+
+        with pytest.raises(geocode_service.RateLimitExceeded):
+            geocode_service.throttle_requests()
+
+        assert self.next_slot(geocode_cache) == booked
+        mock_time.sleep.assert_not_called()
+
+    @patch("handlers.geocode_service.time")
+    def test_unavailable_limiter_falls_back_to_local_pacing(
+        self, mock_time, geocode_cache
+    ):
+        """Test other DynamoDB errors space requests out within the container"""
+        mock_time.time.return_value = self.NOW
+
+        with patch.object(geocode_service, "GEOCODE_CACHE_TABLE", "missing-table"):
+            with patch.object(geocode_service, "last_request_time", self.NOW - 0.1):
+                geocode_service.throttle_requests()
+
+        mock_time.sleep.assert_called_once()
+        wait = mock_time.sleep.call_args.args[0]
+        assert wait == pytest.approx(geocode_service.RATE_LIMIT_DELAY - 0.1)
+
+
+class TestBatchGetCached:
+
+    def test_hits_misses_and_duplicates(self, geocode_cache):
+        """Test one request per distinct key returns only fresh entries"""
+        geocode_cache.put_item(Item=cache_entry("rev_a", "Fresh Address"))
+        geocode_cache.put_item(Item=cache_entry("rev_b", "Old Address", -60))
+
+        dynamodb = geocode_service.dynamodb
+        with patch.object(
+            dynamodb, "batch_get_item", wraps=dynamodb.batch_get_item
+        ) as batch_get:
+            found = geocode_service.batch_get_cached(
+                ["rev_a", "rev_missing", "rev_a", "rev_b"]
+            )
+
+        assert list(found) == ["rev_a"]
+        assert found["rev_a"]["address"] == "Fresh Address"
+        batch_get.assert_called_once()
+        keys = batch_get.call_args.kwargs["RequestItems"][
+            geocode_service.GEOCODE_CACHE_TABLE
+        ]["Keys"]
+        assert keys == [
+            {"cache_key": "rev_a"},
+            {"cache_key": "rev_missing"},
+            {"cache_key": "rev_b"},
+        ]
+
+        # Hits are remembered in memory, so a repeat lookup skips DynamoDB
+        with patch.object(dynamodb, "batch_get_item") as batch_get:
+            assert list(geocode_service.batch_get_cached(["rev_a"])) == ["rev_a"]
+        batch_get.assert_not_called()
+
+    @patch("handlers.geocode_service.time.sleep")
+    def test_unprocessed_keys_are_retried(self, mock_sleep):
+        """Test keys DynamoDB leaves unprocessed are requested again"""
+        table_name = geocode_service.GEOCODE_CACHE_TABLE
+        unprocessed = {table_name: {"Keys": [{"cache_key": "rev_b"}]}}
+        mock_dynamodb = MagicMock()
+        mock_dynamodb.batch_get_item.side_effect = [
+            {
+                "Responses": {table_name: [cache_entry("rev_a", "First")]},
+                "UnprocessedKeys": unprocessed,
+            },
+            {
+                "Responses": {table_name: [cache_entry("rev_b", "Second")]},
+                "UnprocessedKeys": {},
+            },
+        ]
+        geocode_service.local_cache.clear()
+
+        with patch.object(geocode_service, "dynamodb", mock_dynamodb):
+            found = geocode_service.batch_get_cached(["rev_a", "rev_b"])
+        geocode_service.local_cache.clear()
+
+        assert {key: item["address"] for key, item in found.items()} == {
+            "rev_a": "First",
+            "rev_b": "Second",
+        }
+        assert mock_dynamodb.batch_get_item.call_count == 2
+        retry = mock_dynamodb.batch_get_item.call_args_list[1]
+        assert retry.kwargs["RequestItems"] == unprocessed
+        mock_sleep.assert_called_once()
+
+
 class TestHandler:
 
     @patch("handlers.geocode_service.reverse_geocode")
@@ -155,3 +445,27 @@ class TestHandler:
         body = json.loads(response["body"])
         assert isinstance(body["lat"], float)
         assert isinstance(body["lon"], float)
+
+    @patch("handlers.geocode_service.reverse_geocode_many")
+    def test_handler_batch_reverse(self, mock_reverse_geocode_many):
+        """Test handler routes a list body to batch reverse geocoding"""
+        mock_reverse_geocode_many.return_value = [
+            {"address": "First Address"},
+            {"address": "Second Address"},
+        ]
+
+        event = {
+            "queryStringParameters": None,
+            "body": json.dumps(
+                [{"lat": 52.52, "lon": 13.405}, {"lat": 48.137, "lon": 11.575}]
+            ),
+        }
+
+        response = handler(event, {})
+
+        assert response["statusCode"] == 200
+        mock_reverse_geocode_many.assert_called_once_with(
+            [(52.52, 13.405), (48.137, 11.575)]
+        )
+        body = json.loads(response["body"])
+        assert [item["address"] for item in body] == ["First Address", "Second Address"]
@@ -1,3 +1,4 @@
+import base64
 from datetime import datetime
 from decimal import Decimal
 import json
@@ -10,6 +11,7 @@ import pytest
 from handlers.get_drivers_logs import (
     decimal_default,
     fetch_locations_by_time_range,
+    get_route_for_log,
     handler,
 )
 
@@ -154,6 +156,42 @@ class TestFetchLocationsByTimeRange:
             assert result == []
 
 
+class TestGetRouteForLog:
+
+    @patch("handlers.get_drivers_logs.fetch_locations_by_time_range")
+    def test_route_from_stored_locations_is_sorted(self, mock_fetch_locations):
+        """Test the stored-locations fallback is ordered by timestamp"""
+        mock_fetch_locations.return_value = []
+        log_entry = {
+            "startTime": 1681430400,
+            "endTime": 1681430600,
+            "startAddress": "Start",
+            "locations": [
+                {"lat": 52.52, "lon": 13.41, "timestamp": 1681430500},
+                {"lat": 52.51, "lon": 13.40, "timestamp": 1681430400},
+            ],
+        }
+
+        route = get_route_for_log(log_entry)
+
+        assert [point["timestamp"] for point in route] == [1681430400, 1681430500]
+        assert route[0]["address"] == "Start"
+        assert route[1]["segment_type"] == "moving"
+
+    @patch("handlers.get_drivers_logs.fetch_locations_by_time_range")
+    def test_route_without_time_range_skips_query(self, mock_fetch_locations):
+        """Test a log without start/end time uses its stored locations only"""
+        log_entry = {
+            "startTime": None,
+            "locations": [{"lat": 52.52, "lon": 13.41, "timestamp": 1681430400}],
+        }
+
+        route = get_route_for_log(log_entry)
+
+        mock_fetch_locations.assert_not_called()
+        assert len(route) == 1
+
+
 class TestHandler:
 
     @patch("handlers.get_drivers_logs.fetch_locations_by_time_range")
@@ -340,6 +378,166 @@ class TestHandler:
             body = json.loads(response["body"])
             assert "logs" in body
 
+    def test_handler_time_range_and_limit(self, mock_dynamodb_tables):
+        """Test from/to narrow the log list and limit pages through it with a cursor"""
+        logs_table = mock_dynamodb_tables["logs_table"]
+        for i in range(5):
+            logs_table.put_item(
+                Item={
+                    "id": f"session-{i}",
+                    "timestamp": 1681430400 + i * 3600,
+                    "vehicleId": "vehicle_01",
+                }
+            )
+
+        params = {
+            "vehicle_id": "vehicle_01",
+            "from": str(1681430400 + 3600),
+            "to": str(1681430400 + 4 * 3600),
+            "limit": "2",
+        }
+
+        with patch("handlers.get_drivers_logs.logs_table", logs_table):
+            first = json.loads(handler({"queryStringParameters": params}, {})["body"])
+            assert [log["id"] for log in first["logs"]] == ["session-4", "session-3"]
+            assert "nextCursor" in first
+
+            params["cursor"] = first["nextCursor"]
+            second = json.loads(handler({"queryStringParameters": params}, {})["body"])
+            assert [log["id"] for log in second["logs"]] == ["session-2", "session-1"]
+
+    def test_handler_time_range_without_limit(self, mock_dynamodb_tables):
+        """Test an unpaged time range returns every log in it, newest first"""
+        logs_table = mock_dynamodb_tables["logs_table"]
+        for i in range(10):
+            logs_table.put_item(
+                Item={
+                    "id": f"session-{i}",
+                    "timestamp": 1681430400 + i * 3600,
+                    "vehicleId": "vehicle_01",
+                }
+            )
+
+        params = {
+            "vehicle_id": "vehicle_01",
+            "from": str(1681430400 + 3600),
+            "to": str(1681430400 + 8 * 3600),
+        }
+
+        with patch("handlers.get_drivers_logs.logs_table", logs_table):
+            body = json.loads(handler({"queryStringParameters": params}, {})["body"])
+
+        assert [log["id"] for log in body["logs"]] == [
+            f"session-{i}" for i in range(8, 0, -1)
+        ]
+        assert "nextCursor" not in body
+
+    @mock_aws
+    def test_handler_parallel_range_queries_use_client(self):
+        """Test sub-range queries run on the thread-safe client, not the resource"""
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+        logs_table = dynamodb.create_table(
+            TableName="test-logs-table",
+            KeySchema=[
+                {"AttributeName": "id", "KeyType": "HASH"},
+                {"AttributeName": "timestamp", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "id", "AttributeType": "S"},
+                {"AttributeName": "timestamp", "AttributeType": "N"},
+                {"AttributeName": "vehicleId", "AttributeType": "S"},
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "VehicleTimestampIndex",
+                    "KeySchema": [
+                        {"AttributeName": "vehicleId", "KeyType": "HASH"},
+                        {"AttributeName": "timestamp", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                }
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        for i in range(12):
+            logs_table.put_item(
+                Item={
+                    "id": f"session-{i}",
+                    "timestamp": 1681430400 + i * 3600,
+                    "vehicleId": "vehicle_01" if i % 3 else "vehicle_02",
+                }
+            )
+
+        params = {
+            "vehicle_id": "vehicle_01",
+            "from": str(1681430400),
+            "to": str(1681430400 + 11 * 3600),
+        }
+
+        with patch("handlers.get_drivers_logs.logs_table", logs_table), patch.object(
+            logs_table, "query", side_effect=AssertionError("resource used")
+        ), patch.object(logs_table, "scan", side_effect=AssertionError("scanned")):
+            body = json.loads(handler({"queryStringParameters": params}, {})["body"])
+
+        assert [log["id"] for log in body["logs"]] == [
+            f"session-{i}" for i in range(11, 0, -1) if i % 3
+        ]
+
+    def test_handler_invalid_limit(self, mock_dynamodb_tables):
+        """Test handler rejects a non-numeric limit"""
+        event = {"queryStringParameters": {"vehicle_id": "vehicle_01", "limit": "many"}}
+
+        with patch(
+            "handlers.get_drivers_logs.logs_table", mock_dynamodb_tables["logs_table"]
+        ):
+            response = handler(event, {})
+
+            assert response["statusCode"] == 400
+
+    def test_handler_inverted_time_range(self):
+        """Test handler rejects a from later than to instead of scanning"""
+        params = {"vehicle_id": "vehicle_01", "from": "1681434000", "to": "1681430400"}
+
+        with patch("handlers.get_drivers_logs.logs_table") as mock_table:
+            response = handler({"queryStringParameters": params}, {})
+
+            assert response["statusCode"] == 400
+            mock_table.query.assert_not_called()
+            mock_table.scan.assert_not_called()
+
+    def test_handler_forged_cursor(self):
+        """Test handler rejects a decodable cursor that is not a log index key"""
+        forged = base64.urlsafe_b64encode(
+            json.dumps({"id": "session-1", "timestamp": 1681430400}).encode()
+        ).decode()
+        params = {"vehicle_id": "vehicle_01", "limit": "2", "cursor": forged}
+
+        with patch("handlers.get_drivers_logs.logs_table") as mock_table:
+            response = handler({"queryStringParameters": params}, {})
+
+            assert response["statusCode"] == 400
+            mock_table.query.assert_not_called()
+            mock_table.scan.assert_not_called()
+
+    def test_handler_validation_error_does_not_scan(self):
+        """Test only a missing index falls back to a full table scan"""
+        from botocore.exceptions import ClientError
+
+        error_response = {
+            "Error": {
+                "Code": "ValidationException",
+                "Message": "Invalid KeyConditionExpression",
+            }
+        }
+        params = {"vehicle_id": "vehicle_01", "limit": "2"}
+
+        with patch("handlers.get_drivers_logs.logs_table") as mock_table:
+            mock_table.query.side_effect = ClientError(error_response, "Query")
+            response = handler({"queryStringParameters": params}, {})
+
+            assert response["statusCode"] == 500
+            mock_table.scan.assert_not_called()
+
     @patch("handlers.get_drivers_logs.fetch_locations_by_time_range")
     @mock_aws
     def test_handler_empty_results(self, mock_fetch_locations):
@@ -13,11 +13,11 @@ from handlers.get_dynamic_location_history import (
     clean_phantom_locations,
     create_api_response,
     decimal_default,
-    extend_session_points,
     handler,
     haversine,
     parse_timestamp_safely,
     query_location_range,
+    session_extension_length,
 )
 
 
@@ -276,101 +276,42 @@ class TestDatabaseOperations:
         assert calc_end > calc_start
 
 
-class TestExtendSessionPoints:
+class TestSessionExtensionLength:
 
-    @patch("handlers.get_dynamic_location_history.parse_timestamp_safely")
-    def test_extend_session_points_backward(self, mock_parse):
-        """Test extending session points backward"""
-        mock_table = Mock()
-        mock_table.query.return_value = {
-            "Items": [
-                {
-                    "id": "vehicle_01",
-                    "timestamp": 1681430100,
-                    "lat": 52.5200,
-                    "lon": 13.4050,
-                }
-            ]
-        }
-
-        boundary_time = datetime.fromtimestamp(1681430400)
-        mock_parse.return_value = boundary_time
-
-        points, new_boundary, error = extend_session_points(
-            mock_table, "vehicle_01", 1681430400, "backward", 50
-        )
-
-        assert error is None
-        assert len(points) == 1
-        assert new_boundary == 1681430100
+    def test_backward_stops_at_gap(self):
+        """Test a backward walk follows 50-minute steps and stops at a larger gap"""
+        # 10000 is over 50 minutes before 14000; the rest chain back from 20000
+        epochs = [10000, 14000, 16000, 18500]
+        assert session_extension_length(epochs, 20000, "backward") == 3
 
-    @patch("handlers.get_dynamic_location_history.parse_timestamp_safely")
-    def test_extend_session_points_forward(self, mock_parse):
-        """Test extending session points forward"""
-        mock_table = Mock()
-        mock_table.query.return_value = {
-            "Items": [
-                {
-                    "id": "vehicle_01",
-                    "timestamp": 1681430700,
-                    "lat": 52.5200,
-                    "lon": 13.4050,
-                }
-            ]
-        }
-
-        boundary_time = datetime.fromtimestamp(1681430400)
-        mock_parse.return_value = boundary_time
+    def test_backward_without_earlier_points(self):
+        """Test a backward walk with nothing within reach adds no points"""
+        assert session_extension_length([1000], 20000, "backward") == 0
+        assert session_extension_length([], 20000, "backward") == 0
 
-        points, new_boundary, error = extend_session_points(
-            mock_table, "vehicle_01", 1681430400, "forward", 50
-        )
+    def test_forward_stops_at_gap(self):
+        """Test a forward walk follows 50-minute steps and stops at a larger gap"""
+        epochs = [21000, 23000, 26000, 40000]
+        assert session_extension_length(epochs, 20000, "forward") == 3
 
-        assert error is None
-        assert len(points) == 1
-        assert new_boundary == 1681430700
+    def test_forward_stops_near_now(self):
+        """Test a forward walk ends once the boundary is close to the current time"""
+        epochs = [21000, 23000, 26000]
+        assert session_extension_length(epochs, 20000, "forward", now=23100) == 2
 
-    def test_extend_session_points_no_points(self):
-        """Test extending session points when no points found"""
-        mock_table = Mock()
-        mock_table.query.return_value = {"Items": []}
-
-        with patch(
-            "handlers.get_dynamic_location_history.parse_timestamp_safely"
-        ) as mock_parse:
-            mock_parse.return_value = datetime.fromtimestamp(1681430400)
-
-            points, new_boundary, error = extend_session_points(
-                mock_table, "vehicle_01", 1681430400, "backward", 50
-            )
-
-            assert points == []
-            assert error == "No points found"
-
-    def test_extend_session_points_error(self):
-        """Test extending session points with error"""
-        mock_table = Mock()
-        mock_table.query.side_effect = Exception("Database error")
-
-        with patch(
-            "handlers.get_dynamic_location_history.parse_timestamp_safely"
-        ) as mock_parse:
-            mock_parse.return_value = datetime.fromtimestamp(1681430400)
-
-            points, new_boundary, error = extend_session_points(
-                mock_table, "vehicle_01", 1681430400, "backward", 50
-            )
-
-            assert points == []
-            assert "Database error" in error
+    def test_step_limit(self):
+        """Test a walk takes at most 15 extension steps"""
+        epochs = [1000 * k for k in range(1, 40)]
+        assert session_extension_length(epochs, 40000, "backward") == 39
+        dense = [3000 * k for k in range(1, 40)]
+        assert session_extension_length(dense, 120000, "backward") == 15
 
 
 class TestHandler:
 
     @patch("handlers.get_dynamic_location_history.query_location_range")
-    @patch("handlers.get_dynamic_location_history.extend_session_points")
     @patch("handlers.get_dynamic_location_history.clean_phantom_locations")
-    def test_handler_success(self, mock_clean, mock_extend, mock_query):
+    def test_handler_success(self, mock_clean, mock_query):
         """Test successful handler execution"""
         # Mock the query response
         mock_query.return_value = (
@@ -385,9 +326,6 @@ class TestHandler:
             None,
         )
 
-        # Mock extension (no additional points)
-        mock_extend.return_value = ([], 1681430400, "No points found")
-
         # Mock cleaning
         mock_clean.return_value = [
             {
@@ -414,6 +352,51 @@ class TestHandler:
         assert len(body) == 1
         assert "timestamp_str" in body[0]
 
+    @patch("handlers.get_dynamic_location_history.query_location_range")
+    @patch("handlers.get_dynamic_location_history.clean_phantom_locations")
+    def test_handler_stitches_extension_points(self, mock_clean, mock_query):
+        """Test the session is extended by the points within 50-minute steps"""
+        start = 1681430400
+        end = start + 3600
+        # Two points chain back from the range, then a gap over 50 minutes;
+        # likewise two points chain forward from it
+        timestamps = [
+            start - 9000,
+            start - 4000,
+            start - 2000,
+            start,
+            end,
+            end + 1000,
+            end + 2500,
+            end + 9000,
+        ]
+        stored = [
+            {"id": "vehicle_01", "timestamp": ts, "lat": 52.52, "lon": 13.405}
+            for ts in timestamps
+        ]
+
+        def query_range(table, vehicle_id, range_start, range_end):
+            low, high = float(range_start), float(range_end)
+            return [p for p in stored if low <= p["timestamp"] <= high], None
+
+        mock_query.side_effect = query_range
+        mock_clean.side_effect = lambda points: points
+
+        event = {
+            "queryStringParameters": {
+                "vehicle_id": "vehicle_01",
+                "start_timestamp": str(start),
+                "end_timestamp": str(end),
+            }
+        }
+
+        response = handler(event, {})
+
+        assert response["statusCode"] == 200
+        assert mock_query.call_count == 3  # the range plus one query per side
+        body = json.loads(response["body"])
+        assert [p["timestamp"] for p in body] == timestamps[1:-1]
+
     def test_handler_no_query_params(self):
         """Test handler with no query parameters"""
         event = {"queryStringParameters": None}
@@ -11,6 +11,7 @@ from handlers.gps_processing import (
     is_outlier_temporal,
     parse_timestamp,
     reset_location_history,
+    to_decimal_safe,
 )
 
 # Mark all tests in this file as unit tests
@@ -183,6 +184,25 @@ class TestHaversineDistance:
         assert 220000 < distance < 225000
 
 
+class TestToDecimalSafe:
+
+    def test_to_decimal_safe_numbers(self):
+        """Test numeric values convert to float without a string round-trip"""
+        assert to_decimal_safe(12.5) == 12.5
+        assert to_decimal_safe(7) == 7.0
+        assert isinstance(to_decimal_safe(7), float)
+
+    def test_to_decimal_safe_strings(self):
+        """Test numeric strings are parsed and invalid ones are dropped"""
+        assert to_decimal_safe("65.77") == 65.77
+        assert to_decimal_safe("not a number") is None
+
+    def test_to_decimal_safe_missing_values(self):
+        """Test None and empty string map to None"""
+        assert to_decimal_safe(None) is None
+        assert to_decimal_safe("") is None
+
+
 class TestSpeedCalculation:
 
     def test_calculate_speed_normal(self):
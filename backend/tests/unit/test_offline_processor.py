@@ -0,0 +1,65 @@
+import importlib.util
+import os
+
+import pytest
+
+# The offline processor is a standalone script, not part of the handlers package
+OFFLINE_SCRIPT = os.path.join(
+    os.path.dirname(__file__), "..", "..", "backend", "test_processor_offline.py"
+)
+spec = importlib.util.spec_from_file_location("processor_offline", OFFLINE_SCRIPT)
+offline = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(offline)
+
+# Mark all tests in this file as unit tests
+pytestmark = pytest.mark.unit
+
+
+class TestOutlierWindow:
+
+    def setup_method(self):
+        offline.reset_location_history()
+
+    def test_window_average_follows_last_three_points(self):
+        """Test the running sums track the last three locations only"""
+        for lat in (50.0, 51.0, 52.0, 53.0):
+            offline.add_to_location_history({"lat": lat, "lon": lat / 10})
+
+        assert offline.recent_lat_sum == pytest.approx(51.0 + 52.0 + 53.0)
+        assert offline.recent_lon_sum == pytest.approx(15.6)
+        assert len(offline.location_history) == 4
+
+    @pytest.mark.parametrize(
+        "malformed", [{"lon": 13.0}, {"lat": "north", "lon": 13.0}, {"lat": None}]
+    )
+    def test_malformed_record_leaves_window_intact(self, malformed):
+        """Test a record without usable coordinates does not corrupt the average"""
+        for i in range(3):
+            offline.add_to_location_history({"lat": 52.52, "lon": 13.405 + i * 1e-4})
+
+        with pytest.raises((KeyError, TypeError, ValueError)):
+            offline.add_to_location_history(malformed)
+
+        assert len(offline.location_history) == 3
+        # A point near the window is still accepted, a far one still filtered
+        near = {"lat": 52.5201, "lon": 13.4051}
+        assert not offline.is_outlier(near)
+        offline.add_to_location_history(near)
+        assert offline.recent_lat_sum / 3 == pytest.approx(52.52 + 1e-4 / 3)
+        assert offline.is_outlier({"lat": 52.6, "lon": 13.405})
+
+    def test_processing_recovers_after_malformed_record(self, tmp_path):
+        """Test the records after a malformed one are judged against valid points"""
+        records = [{"lat": 52.52, "lon": 13.405 + i * 1e-3} for i in range(3)]
+        records.append({"lon": 13.41})  # no latitude
+        records.append({"lat": 52.52, "lon": 13.409})
+
+        with open(tmp_path / "out.jsonl", "w") as output_file:
+            results = [
+                offline.process_single_location_offline(record, output_file)
+                for record in records
+            ]
+
+        assert results[3]["processing_result"] == "error"
+        assert results[4]["processing_result"] == "stored"
+        assert offline.recent_lat_sum / 3 == pytest.approx(52.52)
@@ -103,6 +103,28 @@ class TestProcessorUtilityFunctions:
         )
         assert result is False
 
+    def test_is_significant_movement_matches_haversine_near_threshold(self):
+        """Test the flat-earth shortcut agrees with haversine around the threshold"""
+        previous_loc = {"lat": 52.5200, "lon": 13.4050}
+
+        for step in range(1, 40):
+            offset = step * 0.000005  # ~0.5m latitude steps across 10m
+            for new_loc in (
+                {"lat": 52.5200 + offset, "lon": 13.4050},
+                {"lat": 52.5200, "lon": 13.4050 + offset * 1.6},
+                {"lat": 52.5200 - offset * 0.7, "lon": 13.4050 + offset * 1.1},
+            ):
+                distance = processor.haversine_distance(
+                    previous_loc["lat"],
+                    previous_loc["lon"],
+                    new_loc["lat"],
+                    new_loc["lon"],
+                )
+                result = processor.is_significant_movement(
+                    new_loc, previous_loc, min_distance=10
+                )
+                assert result is (distance >= 10)
+
 
 class TestLocationHistory:
     """Test location history management"""
@@ -493,6 +515,8 @@ class TestProcessLocation:
         assert result["statusCode"] == 200
         body = json.loads(result["body"])
         assert "Processed 2 locations" in body["status"]
+        assert body["total"] == 2
+        assert body["successful"] == 2
         assert mock_process_single.call_count == 2
 
     @patch("handlers.processor.process_single_location")
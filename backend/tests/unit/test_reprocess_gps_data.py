@@ -0,0 +1,117 @@
+from datetime import datetime
+import json
+import os
+import sys
+import time
+
+import pytest
+
+# The reprocess tool is a standalone script next to the handlers, not under src
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+import reprocess_gps_data  # noqa: E402
+
+# Mark all tests in this file as unit tests
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def west_of_utc(monkeypatch):
+    """Run in a timezone where the naive 1970 fallback has a positive epoch"""
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+class TestParseTimestamp:
+
+    @pytest.mark.parametrize(
+        "suffix", ["+02:00", "Z", " MES", " MESZ", " CET", " CEST"]
+    )
+    def test_timezone_suffix_is_ignored(self, suffix):
+        """Test each timezone suffix the GPS loggers write is stripped"""
+        result = reprocess_gps_data.parse_timestamp("2025-04-14T02:26:59" + suffix)
+        assert result == datetime(2025, 4, 14, 2, 26, 59)
+
+    def test_unparsable_timestamp_falls_back_to_epoch_start(self):
+        """Test an unparsable time falls back to the 1970 sentinel"""
+        result = reprocess_gps_data.parse_timestamp("yesterday")
+        assert result == datetime(1970, 1, 1)
+
+
+class TestRecordEpoch:
+
+    def test_timestamp_field_is_used_as_is(self):
+        """Test the epoch timestamp field wins over the time field"""
+        record = {"timestamp": 1745308800, "time": "yesterday"}
+        assert reprocess_gps_data.record_epoch(record) == 1745308800
+
+    def test_time_field_is_parsed_without_timestamp(self):
+        """Test a null or missing timestamp falls back to the time field"""
+        record = {"timestamp": None, "time": "2025-04-22T08:00:00"}
+        expected = int(datetime(2025, 4, 22, 8).timestamp())
+        assert reprocess_gps_data.record_epoch(record) == expected
+
+    def test_unusable_time_is_zero(self, west_of_utc):
+        """Test records without a parsable time return 0 in any timezone"""
+        assert reprocess_gps_data.record_epoch({"time": "yesterday"}) == 0
+        assert reprocess_gps_data.record_epoch({"timestamp": None}) == 0
+
+
+class TestAnalyzeAndLoad:
+
+    def write_jsonl(self, tmp_path, records):
+        path = tmp_path / "2025-04-22_locations.jsonl"
+        path.write_text("\n".join(json.dumps(record) for record in records) + "\n")
+        return str(path)
+
+    def test_time_only_records_are_bounded_by_time(self, tmp_path):
+        """Test the range follows the times, not the raw line bytes"""
+        path = self.write_jsonl(
+            tmp_path,
+            [
+                {"time": "2025-04-22T09:00:00+02:00", "device_id": "vehicle_01"},
+                {"device_id": "vehicle_01", "time": "2025-04-22T08:00:00+02:00"},
+            ],
+        )
+
+        info, points = reprocess_gps_data.analyze_and_load(path)
+
+        assert info["start_time"] == datetime(2025, 4, 22, 8)
+        assert info["end_time"] == datetime(2025, 4, 22, 9)
+        assert len(points) == 2
+
+    def test_records_without_usable_time_do_not_stretch_range(
+        self, tmp_path, west_of_utc
+    ):
+        """Test null timestamps and unparsable times are left out of the range"""
+        path = self.write_jsonl(
+            tmp_path,
+            [
+                {"device_id": "vehicle_01", "timestamp": None},
+                {"device_id": "vehicle_01", "time": "garbage"},
+                {"device_id": "vehicle_01", "timestamp": 1745308800},
+                {"device_id": "vehicle_01", "timestamp": 1745312400},
+            ],
+        )
+
+        info, points = reprocess_gps_data.analyze_and_load(path)
+
+        assert (info["start_timestamp"], info["end_timestamp"]) == (
+            1745308800,
+            1745312400,
+        )
+        assert len(points) == 4
+
+    def test_file_without_any_time_is_rejected(self, tmp_path):
+        """Test a file whose records carry no usable time yields no range"""
+        path = self.write_jsonl(
+            tmp_path, [{"device_id": "vehicle_01", "timestamp": None}]
+        )
+
+        info, points = reprocess_gps_data.analyze_and_load(path)
+
+        assert info is None
+        assert len(points) == 1